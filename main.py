@@ -1,78 +1,76 @@
 from models.cubic_game import CubicGame
 from models.ai_logic import AIPlayer
+from models.opening_book import DEFAULT_BOOK_PATH
+from models.background_search import BackgroundSearch, BackgroundPonder
 from views.gui.game_gui import GameGUI
 from time import sleep
 import pygame
 import random
+import os
+
+# posted by the search thread when the AI's move is ready
+AI_MOVE_READY = pygame.USEREVENT + 1
+
+
+def post_move_ready():
+    try:
+        pygame.event.post(pygame.event.Event(AI_MOVE_READY))
+    except pygame.error:  # the window was closed meanwhile
+        pass
 
 def main():
     pygame.init()
+    # the opening book is optional, build it with `python -m models.opening_book`
+    book_path = DEFAULT_BOOK_PATH if os.path.exists(DEFAULT_BOOK_PATH) else None
+    # one game, AI and window for the whole session; a new game only clears them
     game = CubicGame()
-    ai = AIPlayer(game)
+    ai = AIPlayer(game, book_path=book_path)
     gui = GameGUI(game)
-    clock = pygame.time.Clock()
     running = True
 
     if not gui.show_start_menu():
         pygame.quit()
         return
 
+    play_again = True
     while True:
-        play_again = True
         if not play_again:
             pygame.quit()
             return False
         else:
-            game = CubicGame()
-            ai = AIPlayer(game)
-            gui = GameGUI(game)
+            game.reset()
+            ai.new_game()
+            gui.reset(game)
             last_move = None
             human_turn = random.choice([True, False])
             running = True
-
-
-
-        while running:
+            # the AI searches on a worker thread; None while it is not thinking
+            search = None
+            # while the human is to move the AI ponders their likely replies
+            ponder = BackgroundPonder(ai).start() if human_turn else None
+            pondered_move = None
+            # empty cell under the mouse, highlighted on the human's turn
+            hover = None
             gui.draw_board(last_move)
 
-            # 1) handle quit + human clicks
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-
-                if human_turn and event.type == pygame.MOUSEBUTTONDOWN:
-                    cell = gui.get_grid_position(event.pos)
-                    if cell and cell in game.get_available_moves():
-                        # do exactly one human move
-                        game.make_move(*cell, 1)
-                        last_move = cell
-                        human_turn = False
-
-                        # check human win/draw
-                        win, line = game.check_winner(1)
-                        if win:
-                            gui.draw_board(last_move)
-                            gui.draw_win_line(line, gui.colors['win_line_color'])
-                            play_again = gui.show_end_screen('You Win!', 100)
-                            running = False
-                        elif not game.get_available_moves():
-                            gui.draw_board(last_move)
-                            play_again = gui.show_end_screen("It's a Draw!", 50)
-                            running = False
-                        # break immediately so no further events trigger another move
-                        break
-
-            # 2) exactly one AI move, _after_ all events have been processed
-            if not human_turn and running:
-                mv = ai.get_best_move()
+        while running:
+            # 1) exactly one AI move; the search runs in the background and
+            #    wakes this loop with an AI_MOVE_READY event once it is done
+            if not human_turn and search is None:
+                search = BackgroundSearch(ai, known_move=pondered_move, on_done=post_move_ready).start()
+                pondered_move = None
+                gui.redraw([gui.indicator_rect], last_move, thinking=True)
+            if search is not None and search.done():
+                mv = search.result()
+                search = None
+                previous = last_move
                 if mv:
                     game.make_move(*mv, 0)
                     last_move = mv
                 human_turn = True
 
                 # check AI win/draw
-                win, line = game.check_winner(0)
+                win, line = game.check_win_at(*mv, 0) if mv else (False, None)
                 if win:
                     gui.draw_board(last_move)
                     gui.draw_win_line(line, gui.colors['win_line_color'])
@@ -84,8 +82,82 @@ def main():
                     gui.draw_board(last_move)
                     play_again = gui.show_end_screen("It's a Draw!", 50)
                     running = False
+                else:
+                    dirty = [gui.indicator_rect]
+                    dirty += [gui.cell_rect(c) for c in (previous, last_move) if c]
+                    gui.redraw(dirty, last_move)
+                    ponder = BackgroundPonder(ai).start()
+                continue
+
+            # 2) sleep until something happens; while the AI thinks, wake up
+            #    for the next frame of the thinking animation as well
+            if search is not None:
+                event = pygame.event.wait(400 - pygame.time.get_ticks() % 400)
+            else:
+                event = pygame.event.wait()
+            thinking = search is not None
+
+            # 3) handle quit + restart + hover + human clicks
+            if event.type == pygame.QUIT:
+                if search:
+                    search.cancel()
+                if ponder:
+                    ponder.stop()
+                pygame.quit()
+                return
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                # restart: drop the current game, thinking or not
+                if search:
+                    # wait, the next game reuses the AI's tables
+                    search.cancel(wait=True)
+                    search = None
+                if ponder:
+                    ponder.stop()
+                    ponder = None
+                running = False
+
+            elif event.type == pygame.NOEVENT and thinking:
+                gui.redraw([gui.indicator_rect], last_move, thinking=True)
+
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                gui.draw_board(last_move, thinking, hover)
+
+            elif human_turn and event.type == pygame.MOUSEMOTION:
+                cell = gui.get_grid_position(event.pos)
+                if cell not in game.get_available_moves():
+                    cell = None
+                if cell != hover:
+                    dirty = [gui.cell_rect(c) for c in (hover, cell) if c]
+                    hover = cell
+                    gui.redraw(dirty, last_move, thinking, hover)
+
+            elif human_turn and event.type == pygame.MOUSEBUTTONDOWN:
+                cell = gui.get_grid_position(event.pos)
+                if cell and cell in game.get_available_moves():
+                    # do exactly one human move
+                    if ponder:
+                        pondered_move = ponder.finish(cell, ai.depth)
+                        ponder = None
+                    dirty = [gui.cell_rect(c) for c in (last_move, hover, cell) if c]
+                    game.make_move(*cell, 1)
+                    last_move = cell
+                    human_turn = False
+                    hover = None
 
-            clock.tick(30)
+                    # check human win/draw
+                    win, line = game.check_win_at(*cell, 1)
+                    if win:
+                        gui.draw_board(last_move)
+                        gui.draw_win_line(line, gui.colors['win_line_color'])
+                        play_again = gui.show_end_screen('You Win!', 100)
+                        running = False
+                    elif not game.get_available_moves():
+                        gui.draw_board(last_move)
+                        play_again = gui.show_end_screen("It's a Draw!", 50)
+                        running = False
+                    else:
+                        gui.redraw(dirty, last_move)
 
 def game_over(gui, msg, score):
     play_again = gui.show_end_screen(msg, score)
@@ -1,92 +1,716 @@
+import copy
 import math
+import time
+from models.analysis_cache import AnalysisCache
+from models.cubic_game import popcount
+from models.opening_book import OpeningBook
+from models.parallel_search import ParallelSearch
+from models.pn_search import ProofNumberSearch, WIN, LOSS, DRAW
+from models.search_stats import SearchStats
+from models.symmetry import BoardSymmetry
+from models.threat_search import ThreatSpaceSearch, FORCED_WIN
+from models.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+WIN_SCORE = 10000
+# nodes between two clock reads while a time limit is active; a node
+# takes some 10us, so a search stops well under a millisecond late
+TIME_CHECK_INTERVAL = 32
+# share of the time limit a move plans to use on the empty board, rising
+# to all of it as the board fills: early moves leave the most play in
+# which to make up for a shallower search
+MOVE_BUDGET_OPENING = 0.5
+# half-width of the first aspiration window, widened fourfold on each
+# failure until it passes ASPIRATION_MAX; about one line's worth of score
+ASPIRATION_WINDOW = 1000
+ASPIRATION_MAX = 64000
+# late move reductions: quiet moves from this index on, at nodes with at
+# least this depth left, are first searched a ply shallower
+LMR_MIN_MOVES = 4
+LMR_MIN_DEPTH = 3
+# the most a reply can raise the mover's heuristic: stones and lines only
+# ever count against the side that did not play them, the mobility term
+# moves by 5 a ply. A reply that threat extensions search past the
+# leaves is not covered, so with them futility pruning is a heuristic
+FUTILITY_MARGIN = 5
+
+
+# move ordering tiers, searched highest first
+ORDER_TT_MOVE = 6
+ORDER_WIN = 5
+ORDER_BLOCK = 4
+ORDER_FORK = 3
+ORDER_THREAT = 2
+ORDER_KILLER = 1
+ORDER_QUIET = 0
+
+
+class SearchTimeout(Exception):
+    """Raised inside minimax when the time budget of a move is used up
+    or the search was stopped"""
+
 
 class AIPlayer:
-    def __init__(self, game, depth=2):
+    def __init__(self, game, depth=2, tt_size_mb=16, move_ordering=True,
+                 symmetry=True, symmetry_plies=2, book_path=None,
+                 threat_search=True, workers=1, deterministic=False, timing=False,
+                 endgame_empties=16, pvs=True, aspiration=True, lmr=False,
+                 futility=True, threat_extensions=True, cache_path=None,
+                 cache_min_depth=4):
         self.game = game
         self.depth = depth
         self.board_size = game.BOARD_SIZE
+        # kept across get_best_move calls for the whole game; None disables it
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        self.nodes = 0
+        self.deadline = None
+        # only forks can be stopped, and a stopped fork stays stopped
+        self.forked = False
+        self.stopped = False
+        self.pv_move = None
+        # principal variation of the last search, and the line below each
+        # ply of the running one
+        self.pv = []
+        self.pv_lines = [[] for _ in range(game.NUM_CELLS + 2)]
+        # in a parallel worker the best root value any worker has proven,
+        # and the root alpha its root move has been searched with so far
+        self.shared_alpha = None
+        self.root_alpha = -math.inf
+        self.depth_reached = 0
+        self.last_score = None
+        # counters of the running search; `timing` adds per-phase timers
+        self.timing = timing
+        self.stats = SearchStats(timing)
+        self.last_stats = None
+        self.move_ordering = move_ordering
+        # null-window search of all but the first move, and serial
+        # deepening in a window around the score of two plies before
+        self.pvs = pvs
+        self.aspiration = aspiration
+        # selective search, all three relying on the move classification
+        # of move ordering: quiet late moves are searched shallower first,
+        # quiet moves one ply above the leaves that cannot reach alpha are
+        # skipped, and threats made on the horizon are searched a ply deeper.
+        # Reductions are off by default: in Qubic the quiet moves setting up
+        # a later fork are the ones they cut short, and they lost matches
+        # at equal time
+        self.lmr = lmr
+        self.futility = futility
+        self.threat_extensions = threat_extensions
+        self.killers = [[None, None] for _ in range(game.NUM_CELLS + 1)]
+        self.history = [[0] * game.NUM_CELLS, [0] * game.NUM_CELLS]
+        # in the first `symmetry_plies` plies positions are hashed canonically
+        # and only one move per orbit of the position's stabilizer is searched;
+        # restricted to the symmetries the heuristic's cell weights respect,
+        # so searched values are exactly those of the full-width search
+        self.symmetry = BoardSymmetry(game, game.cell_weights) if symmetry else None
+        self.symmetry_plies = symmetry_plies
+        self.stabilizers = [None] * (symmetry_plies + 1)
+        self.book = OpeningBook(book_path, game) if book_path else None
+        # results of searches at least `cache_min_depth` deep are kept on
+        # disk for every process and later game using the same file
+        self.cache = AnalysisCache(cache_path, game) if cache_path else None
+        self.cache_min_depth = cache_min_depth
+        # forcing-sequence solver run before the full-width search
+        self.threat_search = ThreatSpaceSearch(game) if threat_search else None
+        self.last_threat = None
+        # exact solver used instead of the search once at most
+        # `endgame_empties` cells are empty; 0 turns it off
+        self.endgame_empties = endgame_empties
+        self.endgame = ProofNumberSearch(game) if endgame_empties else None
+        self.last_solution = None
+        # root splitting over a process pool when workers > 1
+        self.parallel = ParallelSearch(self, workers, deterministic) if workers > 1 else None
+        # tie-breaker for otherwise equal moves: centre and corner cells first
+        self.static_order = [0] * game.NUM_CELLS
+        for (x, y, z) in game.center_cells:
+            self.static_order[game.cell_index(x, y, z)] = 2
+        for (x, y, z) in game.cell_coords:
+            if self.is_corner(x, y, z):
+                self.static_order[game.cell_index(x, y, z)] = 1
+        # static masks used by the heuristic
+        N = self.board_size
+        self.layer_masks = [
+            game.coords_mask([(x, y, z) for y in range(N) for x in range(N)])
+            for z in range(N)
+        ]
+        self.corner_mask = game.coords_mask(
+            [c for c in game.cell_coords if self.is_corner(*c)])
+        self.edge_mask = game.coords_mask(
+            [c for c in game.cell_coords if self.is_edge_or_corner(*c)]) & ~self.corner_mask
+
+    def fork(self, game):
+        """Player searching `game` instead (usually a copy of ours).
+
+        The fork shares the transposition table, history and worker pool, so
+        what it learns carries over; everything tied to a search is its own."""
+        clone = copy.copy(self)
+        clone.game = game
+        clone.forked = True
+        clone.stopped = False
+        clone.stats = SearchStats(self.timing)
+        clone.killers = [[None, None] for _ in range(game.NUM_CELLS + 1)]
+        clone.stabilizers = [None] * (self.symmetry_plies + 1)
+        clone.pv = []
+        clone.pv_lines = [[] for _ in range(game.NUM_CELLS + 2)]
+        if self.threat_search is not None:
+            clone.threat_search = ThreatSpaceSearch(
+                game, self.threat_search.max_plies, self.threat_search.max_nodes)
+        if self.endgame is not None:
+            clone.endgame = ProofNumberSearch(game, max_nodes=self.endgame.max_nodes,
+                                              table=self.endgame.table)
+        if self.parallel is not None:
+            clone.parallel = copy.copy(self.parallel)
+            clone.parallel.ai = clone
+        return clone
 
-    def get_best_move(self):
-        best_move, _ = self.minimax(self.depth, True, -math.inf, math.inf)
+    def stop(self):
+        """Abort a fork's running search from another thread; it raises
+        SearchTimeout (or, when deepening, returns the last completed
+        iteration's move).
+
+        A stop is for good: every later search of the fork raises
+        SearchTimeout at once, so a stop that lands between two searches is
+        never lost. The player itself cannot be stopped; search on a fork
+        of it to be able to."""
+        if not self.forked:
+            raise RuntimeError('only a fork of an AIPlayer can be stopped')
+        self.stopped = True
+        if self.threat_search is not None:
+            self.threat_search.stopped = True
+        if self.endgame is not None:
+            self.endgame.stopped = True
+
+    def new_game(self):
+        """Forget everything learned about the previous game"""
+        if self.tt is not None:
+            self.tt.clear()
+        if self.endgame is not None:
+            self.endgame.table.clear()
+        self.history = [[0] * self.game.NUM_CELLS, [0] * self.game.NUM_CELLS]
+
+    def get_best_move(self, time_limit_ms=None, max_depth=None):
+        """Pick the AI's move; what the search did is left in `last_stats`"""
+        return self.search(time_limit_ms, max_depth)[0]
+
+    def search(self, time_limit_ms=None, max_depth=None, progress=None):
+        """Pick the AI's move and report on the search: returns (move, stats).
+
+        Without a time limit this is a single search to `max_depth` (default
+        `self.depth`). With `time_limit_ms` it deepens iteratively up to
+        `max_depth` and returns the move of the last completed iteration;
+        the limit counts from this call, book and solvers included.
+        `progress` is called with the SearchStats after every completed depth.
+        """
+        if self.stopped:
+            raise SearchTimeout
+        stats = self.stats = self.last_stats = SearchStats(self.timing)
+        deadline = None if time_limit_ms is None else stats.started + time_limit_ms / 1000
+        move = self.pick_move(deadline, max_depth, progress)
+        stats.move = move
+        stats.score = self.last_score
+        stats.pv = list(self.pv)
+        if stats.source == 'search':
+            # includes the iteration a time limit cut short
+            stats.nodes = self.nodes
+        stats.depth_reached = self.depth_reached
+        stats.elapsed = time.perf_counter() - stats.started
+        return move, stats
+
+    def pick_move(self, deadline, max_depth, progress):
+        if self.game.check_winner(0)[0] or self.game.check_winner(1)[0]:
+            return None
+        if self.book is not None:
+            mv = self.book.probe(self.game)
+            if mv is not None:
+                self.last_score = None
+                self.depth_reached = 0
+                self.pv = [mv]
+                self.stats.source = 'book'
+                return mv
+        if self.threat_search is not None:
+            # a forced win is played straight away; a forced loss is only
+            # reported, the search still picks the most resilient move.
+            # Like the endgame solver it may use half the time left
+            self.last_threat = self.threat_search.analyse(0, self.halfway(deadline))
+            if self.last_threat is not None and self.last_threat.outcome == FORCED_WIN:
+                self.last_score = WIN_SCORE
+                self.depth_reached = len(self.last_threat.sequence)
+                self.pv = list(self.last_threat.sequence)
+                self.stats.source = 'threat'
+                return self.last_threat.sequence[0]
+        self.last_solution = None
+        empties = self.game.NUM_CELLS - self.game.move_count
+        if self.endgame is not None and empties <= self.endgame_empties:
+            # proven results replace the search; if the solver gives up, the
+            # search below still picks a move in the other half of the time
+            solution = self.last_solution = self.endgame.solve(0, self.halfway(deadline))
+            if solution is not None:
+                self.last_score = {WIN: WIN_SCORE, LOSS: -WIN_SCORE}.get(solution.outcome, 0)
+                self.depth_reached = solution.distance
+                self.stats.source = 'endgame'
+                self.stats.nodes = self.endgame.nodes
+                move = solution.move
+                if solution.outcome == DRAW:
+                    # every drawing move holds; take the one that presses most
+                    move = self.order_moves(solution.moves, 0, 0)[0]
+                self.pv = [move]
+                return move
+        cached = None
+        if self.cache is not None:
+            cached = self.cache.probe(self.game)
+            if cached is not None and cached.bound != EXACT:
+                cached = None
+            target = max_depth or self.depth
+            if deadline is not None:
+                target = min(max_depth or empties, empties)
+            if cached is not None and cached.depth >= target:
+                self.last_score = cached.score
+                self.depth_reached = cached.depth
+                self.pv = [cached.move]
+                self.stats.source = 'cache'
+                return cached.move
+        self.stats.source = 'search'
+        if self.tt is not None:
+            self.tt.new_search()
+        self.killers = [[None, None] for _ in range(self.game.NUM_CELLS + 1)]
+        for table in self.history:
+            for i in range(len(table)):
+                table[i] >>= 1
+        self.nodes = 0
+        self.pv_move = None
+        self.pv = []
+        if deadline is None:
+            self.deadline = None
+            depth = max_depth or self.depth
+            best_move, self.last_score = self.search_root(depth)
+            self.depth_reached = depth
+            self.completed(depth, best_move, progress)
+        else:
+            best_move = self.iterative_deepening(deadline, max_depth, progress, cached)
+        if (self.cache is not None and best_move is not None
+                and self.depth_reached >= self.cache_min_depth
+                and (cached is None or self.depth_reached > cached.depth)):
+            self.cache.store(self.game, best_move, self.depth_reached, self.last_score)
         return best_move
 
-    def minimax(self, depth, maximizing, alpha, beta):
-        win, _ = self.game.check_winner(0)
-        if win:
-            return None, 10000
-        win, _ = self.game.check_winner(1)
-        if win:
-            return None, -10000
-        moves = self.game.get_available_moves()
-        if not moves or depth == 0:
-            return None, self.heuristic(0)
+    def halfway(self, deadline):
+        """Deadline for a phase that may use half of the time left"""
+        if deadline is None:
+            return None
+        now = time.perf_counter()
+        return now + (deadline - now) / 2
+
+    def completed(self, depth, move, progress):
+        self.stats.record_iteration(depth, move, self.last_score, self.nodes)
+        self.stats.pv = list(self.pv)
+        if progress is not None:
+            progress(self.stats)
+
+    def iterative_deepening(self, deadline, max_depth=None, progress=None, cached=None):
+        """Deepen until the move's budget is spent; an iteration still
+        running at `deadline` (a time.perf_counter() timestamp) is abandoned.
+        A cached result stands in for the iterations up to its depth."""
+        self.deadline = deadline
+        empties = self.game.NUM_CELLS - self.game.move_count
+        started = self.stats.started
+        budget_end = started + self.move_budget(deadline - started, empties)
+        max_depth = min(max_depth or empties, empties)
+        best_move = None
+        self.depth_reached = 0
+        first = 1
+        if cached is not None:
+            best_move = self.pv_move = cached.move
+            self.last_score = cached.score
+            self.depth_reached = cached.depth
+            self.pv = [cached.move]
+            first = cached.depth + 1
+        scores = []
+        for depth in range(first, max_depth + 1):
+            iter_start = time.perf_counter()
+            try:
+                # a ply more for one side or the other shifts the score a
+                # lot, so the guess is the last score at the same parity
+                move, score = self.aspiration_search(depth, scores[-2] if len(scores) > 1 else None)
+            except SearchTimeout:
+                break
+            scores.append(score)
+            best_move = self.pv_move = move
+            self.last_score = score
+            self.depth_reached = depth
+            self.completed(depth, move, progress)
+            now = time.perf_counter()
+            if not self.next_iteration_fits(now - iter_start, now, empties - depth, budget_end):
+                break
+        self.deadline = None
+        if best_move is None:
+            # not even depth 1 finished; any legal move beats none
+            moves = self.game.get_available_moves()
+            best_move = moves[0] if moves else None
+        return best_move
+
+    def aspiration_search(self, depth, guess):
+        """search_root in a window around `guess`, widened and searched
+        again while the score falls outside it"""
+        if guess is None or not self.aspiration or self.parallel is not None:
+            return self.search_root(depth)
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        pv = self.pv
+        while True:
+            try:
+                move, score = self.search_root(depth, alpha, beta)
+            except SearchTimeout:
+                # an attempt outside its window left a bound's line, or none;
+                # the move kept is the last iteration's, and so is its line
+                self.pv = pv
+                raise
+            if alpha < score < beta:
+                return move, score
+            self.stats.aspiration_researches += 1
+            delta *= 4
+            if score <= alpha:
+                alpha = guess - delta if delta <= ASPIRATION_MAX else -math.inf
+            else:
+                beta = guess + delta if delta <= ASPIRATION_MAX else math.inf
+
+    def search_root(self, depth, alpha=-math.inf, beta=math.inf):
+        """Best root move and its value at `depth`; the window only applies
+        to the serial search. Leaves the principal variation in `pv`."""
+        if self.parallel is not None:
+            deadline = None
+            if self.deadline is not None:
+                deadline = time.time() + (self.deadline - time.perf_counter())
+            move, value, self.pv = self.parallel.search(depth, deadline)
+            return move, value
+        move, value = self.negamax(depth, 0, alpha, beta)
+        self.pv = self.pv_lines[0]
+        return move, value
+
+    def close(self):
+        """Shut down the worker processes of a parallel AIPlayer and close
+        the opening book and the analysis cache"""
+        if self.parallel is not None:
+            self.parallel.close()
+        if self.book is not None:
+            self.book.close()
+        if self.cache is not None:
+            self.cache.close()
 
+    def move_budget(self, time_limit, empties):
+        """Seconds a move with `empties` empty cells plans to think, out of
+        `time_limit`: MOVE_BUDGET_OPENING of it on the empty board, rising
+        linearly to all of it on a full one"""
+        filled = 1 - empties / self.game.NUM_CELLS
+        return time_limit * (MOVE_BUDGET_OPENING + (1 - MOVE_BUDGET_OPENING) * filled)
+
+    def next_iteration_fits(self, last_iter_time, now, remaining, budget_end):
+        """Guess whether one more ply can finish before `budget_end`.
+
+        The next iteration costs roughly the last one times the effective
+        branching factor, which alpha-beta keeps near the square root of the
+        number of empty cells, so budgets stretch as the board fills up."""
+        if remaining <= 0:
+            return False
+        return now + last_iter_time * math.sqrt(remaining) < budget_end
+
+    def minimax(self, depth, maximizing, alpha, beta, ply=0):
+        """Value for player 0 (the AI), player 0 to move when `maximizing`.
+
+        Kept for callers thinking in minimax terms; the search itself is
+        negamax, which scores positions for the side to move."""
         if maximizing:
-            max_val = -math.inf
-            best_mv = None
-            for mv in moves:
-                x, y, z = mv
-                self.game.make_move(x, y, z, 0)
-                _, val = self.minimax(depth-1, False, alpha, beta)
-                self.game.undo_move(x, y, z)
-                if val > max_val:
-                    max_val, best_mv = val, mv
-                alpha = max(alpha, val)
-                if beta <= alpha:
-                    break
-            return best_mv, max_val
-        else:
-            min_val = math.inf
-            best_mv = None
-            for mv in moves:
-                x, y, z = mv
-                self.game.make_move(x, y, z, 1)
-                _, val = self.minimax(depth-1, True, alpha, beta)
-                self.game.undo_move(x, y, z)
-                if val < min_val:
-                    min_val, best_mv = val, mv
-                beta = min(beta, val)
-                if beta <= alpha:
-                    break
-            return best_mv, min_val
+            return self.negamax(depth, 0, alpha, beta, ply)
+        move, value = self.negamax(depth, 1, -beta, -alpha, ply)
+        return move, -value
+
+    def negamax(self, depth, player, alpha, beta, ply=0):
+        """Best move and value for `player` to move, from its point of view.
+
+        Principal variation search: the first move gets the full window,
+        the others a null window that only shows they are no better, and
+        one that turns out better is searched again with the full window.
+        The line of best play found is left in `pv_lines[ply]`."""
+        # terminal wins are detected right after each move via check_win_at,
+        # so a node is only entered for positions nobody has won yet
+        game = self.game
+        stats = self.stats
+        timed = stats.timed
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.stopped or (self.deadline is not None and time.perf_counter() > self.deadline):
+                raise SearchTimeout
+        self.pv_lines[ply] = []
+        sym = self.symmetry if ply < self.symmetry_plies else None
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            if sym is not None:
+                # canonical key: symmetric positions share one entry, whose
+                # move is stored in the canonical frame
+                key, canon_t = sym.canonical_hash(game)
+            else:
+                key = game.hash
+            if player:
+                key ^= game.zobrist_side
+            entry = tt.probe(key)
+            stats.tt_probes += 1
+            if entry is not None:
+                stats.tt_hits += 1
+                tt_move = entry[4]
+                if sym is not None and tt_move is not None:
+                    tt_move = game.cell_coords[sym.inverses[canon_t][game.cell_index(*tt_move)]]
+                # never cut at the root, the caller needs a move from this
+                # search, nor with PVS on the principal variation, so that
+                # the line reported stays whole
+                if ply > 0 and entry[1] >= depth and (beta - alpha == 1 or not self.pvs):
+                    value, flag = entry[2], entry[3]
+                    if flag == EXACT:
+                        stats.tt_cutoffs += 1
+                        return tt_move, value
+                    if flag == LOWER:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+                    if beta <= alpha:
+                        stats.tt_cutoffs += 1
+                        return tt_move, value
+
+        # leaves never list their moves: on large boards that is most of
+        # the cost of a node, and the move count tells a full board apart
+        if depth == 0 or game.move_count == game.NUM_CELLS:
+            stats.leaf_evals += 1
+            if not timed:
+                value = self.heuristic(0)
+            else:
+                t0 = time.perf_counter()
+                value = self.heuristic(0)
+                stats.time_eval += time.perf_counter() - t0
+            return None, -value if player else value
+        if timed:
+            t0 = time.perf_counter()
+        moves = game.get_available_moves()
+        if ply == 0 and self.pv_move is not None:
+            # seed each iteration with the previous one's best move
+            tt_move = self.pv_move
+        tiers = None
+        if self.move_ordering:
+            # the tiers tell quiet moves apart, for killers and the
+            # selective search
+            tiers = []
+            moves = self.order_moves(moves, player, ply, tt_move, tiers)
+        elif tt_move is not None and tt_move != moves[0] and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        if sym is not None:
+            if ply == 0:
+                self.stabilizers[0] = sym.stabilizer(game)
+            stab = self.stabilizers[ply]
+            unique = sym.unique_moves(moves, stab)
+            if tiers is not None and len(unique) < len(moves):
+                tier_of = dict(zip(moves, tiers))
+                tiers = [tier_of[mv] for mv in unique]
+            moves = unique
+        if timed:
+            stats.time_movegen += time.perf_counter() - t0
+        alpha_orig = alpha
+        opponent = 1 - player
+        pv_lines = self.pv_lines
+        sign = -1 if player else 1
+        # selective search needs the tiers of move ordering
+        selective = tiers is not None
+        reduce_from = LMR_MIN_MOVES if selective and self.lmr and depth >= LMR_MIN_DEPTH else len(moves)
+        # one ply above the leaves any reply only lowers the mover's score
+        # (but for FUTILITY_MARGIN), so the score after a quiet move bounds
+        # its value. An extended threat in reply is followed by our block,
+        # which can raise it further: then the bound is only a likely one
+        frontier = selective and self.futility and depth == 2
+        # a threat made on the horizon is searched until the reply: a leaf
+        # would score it as if it could not be blocked
+        extend = selective and self.threat_extensions and depth == 1
+
+        best_val = -math.inf
+        best_mv = None
+        for i, mv in enumerate(moves):
+            if ply == 1 and self.shared_alpha is not None:
+                # a root move proven meanwhile by another worker narrows
+                # the window of the one searched here
+                shared = self.shared_alpha.value
+                if shared > self.root_alpha:
+                    self.root_alpha = shared
+                    beta = min(beta, -shared)
+                    if beta <= alpha:
+                        break
+            x, y, z = mv
+            tier = tiers[i] if selective else ORDER_QUIET
+            quiet = selective and tier <= ORDER_KILLER
+            new_depth = depth - 1
+            if extend and (tier == ORDER_THREAT or tier == ORDER_FORK):
+                stats.extensions += 1
+                new_depth = depth
+            if sym is not None:
+                self.stabilizers[ply+1] = sym.child_stabilizer(stab, mv)
+            game.make_move(x, y, z, player)
+            try:
+                if timed:
+                    t0 = time.perf_counter()
+                    won = game.check_win_at(x, y, z, player)[0]
+                    stats.time_win_check += time.perf_counter() - t0
+                else:
+                    won = game.check_win_at(x, y, z, player)[0]
+                reduced = quiet and i >= reduce_from
+                if won:
+                    val = WIN_SCORE
+                    pv_lines[ply+1] = []
+                elif frontier and quiet and sign * self.heuristic(0) + FUTILITY_MARGIN <= alpha:
+                    stats.futility_prunes += 1
+                    val = sign * self.heuristic(0) + FUTILITY_MARGIN
+                elif i == 0 or alpha == -math.inf or not (self.pvs or reduced):
+                    val = -self.negamax(new_depth, opponent, -beta, -alpha, ply+1)[1]
+                else:
+                    if reduced:
+                        stats.lmr_reductions += 1
+                        val = -self.negamax(new_depth-1, opponent, -alpha-1, -alpha, ply+1)[1]
+                        if val > alpha:
+                            stats.lmr_researches += 1
+                    if not reduced or val > alpha:
+                        if self.pvs:
+                            val = -self.negamax(new_depth, opponent, -alpha-1, -alpha, ply+1)[1]
+                            if alpha < val < beta:
+                                stats.pvs_researches += 1
+                                val = -self.negamax(new_depth, opponent, -beta, -alpha, ply+1)[1]
+                        else:
+                            val = -self.negamax(new_depth, opponent, -beta, -alpha, ply+1)[1]
+            finally:
+                game.undo_move(x, y, z)
+            if val > best_val:
+                best_val, best_mv = val, mv
+            if val > alpha:
+                alpha = val
+                pv_lines[ply] = [mv] + pv_lines[ply+1]
+            if beta <= alpha:
+                stats.beta_cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
+                # wins, blocks and threats are found by their tier anyway,
+                # and the TT move is tried first already
+                if quiet and mv != tt_move:
+                    self.record_cutoff(mv, player, ply, depth)
+                break
+
+        if tt is not None:
+            if best_val <= alpha_orig:
+                flag = UPPER
+            elif best_val >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            store_mv = best_mv
+            if sym is not None and best_mv is not None:
+                store_mv = game.cell_coords[sym.transforms[canon_t][game.cell_index(*best_mv)]]
+            tt.store(key, depth, best_val, flag, store_mv)
+        return best_mv, best_val
+
+    def order_moves(self, moves, player, ply, tt_move=None, tiers=None):
+        """Sort moves so the likeliest cutoffs are searched first.
+
+        Immediate wins, then forced blocks, then moves creating a fork or an
+        open threat, then killer moves of this ply; the history table and the
+        centre/corner cells break ties, and the scan order breaks the rest.
+        If a list is given as `tiers` it receives the tier of each sorted
+        move, the transposition-table move keeping its own tier there."""
+        game = self.game
+        N = self.board_size
+        own = game.line_counts[player]
+        opp = game.line_counts[1 - player]
+        cell_lines = game.cell_lines
+        history = self.history[player]
+        static_order = self.static_order
+        killers = self.killers[ply]
+        keyed = []
+        for mv in moves:
+            idx = mv[0] + N * (mv[1] + N * mv[2])
+            tier = ORDER_QUIET
+            threats = 0
+            for i in cell_lines[idx]:
+                pc, oc = own[i], opp[i]
+                if oc == 0:
+                    if pc == N - 1:
+                        tier = ORDER_WIN
+                        break
+                    if pc == N - 2:
+                        threats += 1
+                elif pc == 0 and oc == N - 1:
+                    tier = ORDER_BLOCK
+            if tier == ORDER_QUIET:
+                if threats >= 2:
+                    tier = ORDER_FORK
+                elif threats:
+                    tier = ORDER_THREAT
+                elif mv in killers:
+                    tier = ORDER_KILLER
+            rank = ORDER_TT_MOVE if mv == tt_move else tier
+            keyed.append((rank, history[idx], static_order[idx], mv, tier))
+        # stable sort: equal keys keep the z/y/x scan order
+        keyed.sort(key=lambda k: k[:3], reverse=True)
+        if tiers is not None:
+            tiers.extend(k[4] for k in keyed)
+        return [k[3] for k in keyed]
+
+    def predict_replies(self, count=3):
+        """The opponent's most plausible moves in the current position.
+
+        Ranked like the search ranks moves for the opponent, using the
+        killer moves the last search found for the opponent's ply."""
+        moves = self.game.get_available_moves()
+        return self.order_moves(moves, 1, 1)[:count]
+
+    def record_cutoff(self, mv, player, ply, depth):
+        """Remember a quiet move that caused a beta cutoff"""
+        killers = self.killers[ply]
+        if killers[0] != mv:
+            killers[1] = killers[0]
+            killers[0] = mv
+        self.history[player][self.game.cell_index(*mv)] += depth * depth
 
     def heuristic(self, player):
-        """Alternative heuristic focusing on layer dominance and potential threats"""
+        """Alternative heuristic focusing on layer dominance and potential threats.
+
+        Reads the running totals CubicGame maintains in make_move/undo_move, so
+        it is O(1); static_heuristic is the equivalent full recomputation."""
+        opp = 1 - player
+        game = self.game
+        score = game.positional[player] - game.positional[opp]
+        score += game.potential[player] - 2 * game.potential[opp]
+        available_moves = game.NUM_CELLS - game.move_count
+        score += available_moves * (1 if player == 0 else -1) * 5
+        return score
+
+    def static_heuristic(self, player):
+        """Recompute heuristic() from scratch over the whole board"""
         opp = 1 - player
+        own_bb = self.game.bitboards[player]
+        opp_bb = self.game.bitboards[opp]
         score = 0
-        
+
         # 1. Layer control bonus (middle layers are more valuable)
-        layer_weights = [1, 3, 3, 1] if self.board_size == 4 else [1, 2, 1]
-        for z in range(self.board_size):
-            layer_score = 0
-            for y in range(self.board_size):
-                for x in range(self.board_size):
-                    if self.game.board[z][y][x] == player:
-                        layer_score += layer_weights[z] * 5
-                    elif self.game.board[z][y][x] == opp:
-                        layer_score -= layer_weights[z] * 5
-            score += layer_score
-        
+        layer_weights = self.game.layer_weights()
+        for z, layer_mask in enumerate(self.layer_masks):
+            score += layer_weights[z] * 5 * (popcount(own_bb & layer_mask) - popcount(opp_bb & layer_mask))
+
         # 2. Edge and corner control
         edge_bonus = 15
         corner_bonus = 25
-        for z in range(self.board_size):
-            for y in range(self.board_size):
-                for x in range(self.board_size):
-                    if self.is_edge_or_corner(x, y, z):
-                        if self.game.board[z][y][x] == player:
-                            score += corner_bonus if self.is_corner(x, y, z) else edge_bonus
-                        elif self.game.board[z][y][x] == opp:
-                            score -= corner_bonus if self.is_corner(x, y, z) else edge_bonus
+        score += corner_bonus * (popcount(own_bb & self.corner_mask) - popcount(opp_bb & self.corner_mask))
+        score += edge_bonus * (popcount(own_bb & self.edge_mask) - popcount(opp_bb & self.edge_mask))
 
         # 3. Line potential with progressive blocking
-        for line in self.game.winning_lines:
-            pc = sum(1 for (x, y, z) in line if self.game.board[z][y][x] == player)
-            oc = sum(1 for (x, y, z) in line if self.game.board[z][y][x] == opp)
-            
+        for line_mask in self.game.line_masks:
+            pc = popcount(own_bb & line_mask)
+            oc = popcount(opp_bb & line_mask)
+
             if pc > 0 and oc > 0:  # Blocked line
                 continue
-                
+
             if pc > 0:
                 line_value = 10 ** (pc + 1)
                 if pc == self.board_size - 1:  # Immediate win
@@ -99,7 +723,7 @@ class AIPlayer:
                 score -= line_value * 2  # Higher penalty for opponent's potential
 
         # 4. Mobility factor (encourage keeping options open)
-        available_moves = len(self.game.get_available_moves())
+        available_moves = popcount(self.game.empty_mask())
         score += available_moves * (1 if player == 0 else -1) * 5
 
         return score
@@ -0,0 +1,176 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from models.symmetry import BoardSymmetry
+from models.transposition import EXACT, LOWER, UPPER
+
+# seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 5.0
+
+# stores between two checks of the size bound
+EVICT_INTERVAL = 256
+
+# rows read since the last write whose use is recorded in one batch
+TOUCH_BATCH = 256
+
+# result of a probe, in the frame of the probed position; `score` is for
+# player 0 (the AI) to move, `bound` one of EXACT, LOWER, UPPER
+CachedResult = namedtuple('CachedResult', ['move', 'depth', 'score', 'bound'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS positions (
+    board_size INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    bound INTEGER NOT NULL,
+    move INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (board_size, key)
+);
+CREATE INDEX IF NOT EXISTS positions_used ON positions (used);
+'''
+
+
+class AnalysisCache:
+    """Search results kept on disk and shared by every process using the file.
+
+    Positions are keyed by board size and the canonical hash of the
+    position with player 0 (the AI) to move, so symmetric positions share
+    one row whose move is stored in the canonical frame, as in the opening
+    book. The database runs in WAL mode: readers in other processes never
+    wait for a writer, and writers take turns. Each row remembers when it
+    was last stored or read; past `max_entries` rows the least recently
+    used ones are evicted. A probe is only a read: the use of the rows it
+    hit is recorded in memory and written with the next store, or once
+    TOUCH_BATCH of them have piled up, so readers do not queue for the
+    writer's lock.
+    """
+
+    def __init__(self, path, game, max_entries=100000):
+        self.path = path
+        self.game = game
+        self.max_entries = max_entries
+        # keyed with the same symmetry group the search uses
+        self.symmetry = BoardSymmetry(game, game.cell_weights)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # forks of an AIPlayer share the cache with their search thread
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # a crash may lose the last commits, never corrupt the file
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._stores = 0
+        # (board size, key) -> time of the last probe hit not yet written
+        self._touched = {}
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def probe(self, game=None):
+        """Cached result for the current position, or None"""
+        game = game or self.game
+        key, t = self.symmetry.canonical_hash(game)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT depth, score, bound, move FROM positions WHERE board_size = ? AND key = ?',
+                (game.BOARD_SIZE, _signed(key))).fetchone()
+            if row is None:
+                return None
+            self._touched[game.BOARD_SIZE, _signed(key)] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+        depth, score, bound, cell = row
+        cell = self.symmetry.inverses[t][cell]
+        if (game.bitboards[0] | game.bitboards[1]) >> cell & 1:
+            return None  # hash collision
+        return CachedResult(game.cell_coords[cell], depth, score, bound)
+
+    def store(self, game, move, depth, score, bound=EXACT):
+        """Keep the result of a search of the current position; a deeper
+        result already stored is kept instead"""
+        if bound not in (EXACT, LOWER, UPPER):
+            raise ValueError(f'unknown bound {bound!r}')
+        key, t = self.symmetry.canonical_hash(game)
+        cell = self.symmetry.transforms[t][game.cell_index(*move)]
+        with self._lock:
+            # the batched reads are recorded in the same write transaction
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._flush_touched()
+                self._conn.execute(
+                    'INSERT INTO positions (board_size, key, depth, score, bound, move, used) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (board_size, key) DO UPDATE SET depth = excluded.depth, '
+                    'score = excluded.score, bound = excluded.bound, move = excluded.move, '
+                    'used = excluded.used WHERE excluded.depth >= positions.depth',
+                    (game.BOARD_SIZE, _signed(key), depth, int(score), bound, cell, time.time()))
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            self._stores += 1
+            if self._stores % EVICT_INTERVAL == 0:
+                self._evict()
+
+    def evict(self):
+        """Drop the least recently used rows beyond `max_entries`"""
+        with self._lock:
+            self._flush_touched()
+            self._evict()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                'UPDATE positions SET used = ? WHERE board_size = ? AND key = ? AND used < ?',
+                [(used, size, key, used) for (size, key), used in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        excess = self._conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM positions WHERE rowid IN '
+                '(SELECT rowid FROM positions ORDER BY used LIMIT ?)', (excess,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM positions')
+
+
+def _signed(key):
+    # SQLite integers are signed 64-bit, Zobrist hashes unsigned
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+if __name__ == '__main__':
+    from models.cubic_game import CubicGame
+
+    parser = argparse.ArgumentParser(description='Inspect or trim a CubiXpert analysis cache')
+    parser.add_argument('path')
+    parser.add_argument('--size', type=int, default=4, help='board size')
+    parser.add_argument('--max-entries', type=int, help='evict down to this many positions')
+    parser.add_argument('--clear', action='store_true', help='drop every position')
+    args = parser.parse_args()
+    cache = AnalysisCache(args.path, CubicGame(args.size))
+    if args.clear:
+        cache.clear()
+    if args.max_entries is not None:
+        cache.max_entries = args.max_entries
+        cache.evict()
+    print(f'{len(cache)} positions in {args.path}')
+    cache.close()
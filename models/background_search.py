@@ -0,0 +1,122 @@
+import threading
+
+from models.ai_logic import SearchTimeout
+
+
+class BackgroundSearch:
+    """Run AIPlayer.search on a worker thread.
+
+    The search works on a copy of the game, so the caller can keep reading
+    (and drawing) the real board meanwhile; poll `done()` once per frame and
+    collect the move with `result()`; `stats` then holds the SearchStats.
+    Instead of polling, `on_done` can be given: it is called on the worker
+    thread when the search ends. `cancel()` stops the search early. A
+    finished search hands its killer moves back to `ai`, whose reply
+    predictions for pondering rely on them.
+    """
+
+    def __init__(self, ai, known_move=None, on_done=None, **search_kwargs):
+        self.parent = ai
+        self.ai = ai.fork(ai.game.copy())
+        self.search_kwargs = search_kwargs
+        self.on_done = on_done
+        # a move found ahead of time (e.g. by pondering) needs no search
+        self.move = known_move
+        self.stats = None
+        self.error = None
+        self.cancelled = False
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if self.move is None:
+            self.thread.start()
+        else:
+            self.finished.set()
+        return self
+
+    def _run(self):
+        try:
+            self.move, self.stats = self.ai.search(**self.search_kwargs)
+            if self.stats.source == 'search' and not self.cancelled:
+                self.parent.killers = self.ai.killers
+        except SearchTimeout:
+            self.move = None
+        except Exception as e:  # re-raised on the caller's thread by result()
+            self.error = e
+        # set before on_done, so done() is already true for its listener
+        self.finished.set()
+        if self.on_done is not None:
+            self.on_done()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def result(self):
+        """The AI's move, or None if the search was cancelled"""
+        if self.error is not None:
+            raise self.error
+        return None if self.cancelled else self.move
+
+    def cancel(self, wait=False):
+        self.cancelled = True
+        self.ai.stop()
+        # no thread runs when the move was known up front
+        if wait and self.thread.is_alive():
+            self.thread.join()
+
+
+class BackgroundPonder:
+    """Think on the human's time.
+
+    While the human is to move, the likeliest replies are each searched
+    with the AI to move afterwards, one ply deeper per round so the effort
+    is spread over all of them. The searches share the AI's transposition
+    table, so even a reply that was not predicted starts from a warm table;
+    a predicted one can be answered without searching at all.
+    """
+
+    def __init__(self, ai, replies=3, max_depth=None):
+        self.replies = ai.predict_replies(replies)
+        self.ai = ai.fork(ai.game.copy())
+        self.max_depth = max_depth
+        # human move -> (AI answer, depth it was searched to)
+        self.answers = {}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        ai = self.ai
+        game = ai.game
+        empties = game.NUM_CELLS - game.move_count - 1
+        max_depth = min(self.max_depth or empties, empties)
+        try:
+            for depth in range(1, max_depth + 1):
+                for reply in self.replies:
+                    game.make_move(*reply, 1)
+                    try:
+                        if game.check_win_at(*reply, 1)[0]:
+                            continue
+                        move = ai.get_best_move(max_depth=depth)
+                    finally:
+                        game.undo_move(*reply)
+                    if move is not None:
+                        self.answers[reply] = (move, max(depth, ai.depth_reached))
+        except SearchTimeout:
+            pass
+
+    def stop(self):
+        self.ai.stop()
+        self.thread.join()
+
+    def finish(self, human_move, min_depth):
+        """Stop pondering; the pondered answer to `human_move` if it was
+        searched to at least `min_depth`, else None"""
+        self.stop()
+        answer = self.answers.get(human_move)
+        if answer is not None and answer[1] >= min_depth:
+            return answer[0]
+        return None
@@ -0,0 +1,104 @@
+"""Vectorised scoring of many positions at once.
+
+Boards are rows of an ``(n, N**3)`` int8 array holding ``-1`` for empty
+cells and ``0``/``1`` for the players, cells ordered like the bitboards
+(``x + N*y + N*N*z``). Line counts for all rows come from one product with
+the ``(N**3, lines)`` cell/line incidence matrix. Requires NumPy, which is
+an optional dependency (``pip install numpy``).
+"""
+from models.cubic_game import CubicGame
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# rows scored per matrix product, bounds the temporaries to a few MB
+CHUNK_ROWS = 1 << 16
+
+_tables = {}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('models.batch_eval needs NumPy: pip install numpy')
+
+
+def _size_tables(board_size):
+    tables = _tables.get(board_size)
+    if tables is None:
+        game = CubicGame(board_size)
+        incidence = np.zeros((game.NUM_CELLS, len(game.winning_lines)), dtype=np.float32)
+        for i, line in enumerate(game.winning_lines):
+            for cell in line:
+                incidence[game.cell_index(*cell), i] = 1
+        weights = np.array(game.cell_weights, dtype=np.float32)
+        values = np.array(game.line_values, dtype=np.int64)
+        tables = _tables[board_size] = (incidence, weights, values)
+    return tables
+
+
+def encode_positions(games):
+    """Stack the positions of CubicGame objects into an (n, N**3) int8 array"""
+    _require_numpy()
+    rows = []
+    for game in games:
+        row = np.full(game.NUM_CELLS, -1, dtype=np.int8)
+        for player in (0, 1):
+            mask = game.bitboards[player]
+            while mask:
+                low = mask & -mask
+                row[low.bit_length() - 1] = player
+                mask ^= low
+        rows.append(row)
+    return np.stack(rows)
+
+
+def _check_boards(boards, board_size):
+    _require_numpy()
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim != 2 or boards.shape[1] != board_size ** 3:
+        raise ValueError(f'boards must have shape (n, {board_size ** 3})')
+    return boards
+
+
+def _line_counts(boards, incidence):
+    c0 = ((boards == 0).astype(np.float32) @ incidence).astype(np.intp)
+    c1 = ((boards == 1).astype(np.float32) @ incidence).astype(np.intp)
+    return c0, c1
+
+
+def evaluate_many(boards, player=0, board_size=4):
+    """AIPlayer.heuristic(player) for every row, as an int64 array"""
+    boards = _check_boards(boards, board_size)
+    incidence, weights, values = _size_tables(board_size)
+    scores = np.empty(len(boards), dtype=np.int64)
+    sign = 5 if player == 0 else -5
+    for start in range(0, len(boards), CHUNK_ROWS):
+        chunk = boards[start:start + CHUNK_ROWS]
+        counts = _line_counts(chunk, incidence)
+        own, opp = counts[player], counts[1 - player]
+        own_open = np.where(opp == 0, values[own], 0).sum(axis=1)
+        opp_open = np.where(own == 0, values[opp], 0).sum(axis=1)
+        own_cells = (chunk == player).astype(np.float32)
+        opp_cells = (chunk == 1 - player).astype(np.float32)
+        positional = (own_cells @ weights - opp_cells @ weights).astype(np.int64)
+        empties = (chunk == -1).sum(axis=1, dtype=np.int64)
+        scores[start:start + CHUNK_ROWS] = positional + own_open - 2 * opp_open + empties * sign
+    return scores
+
+
+def winners_many(boards, board_size=4):
+    """Winner of every row: 0 or 1, or -1 when nobody has a full line.
+
+    Like the search, player 0 is reported if both players have a line."""
+    boards = _check_boards(boards, board_size)
+    incidence, _, _ = _size_tables(board_size)
+    winners = np.empty(len(boards), dtype=np.int8)
+    for start in range(0, len(boards), CHUNK_ROWS):
+        chunk = boards[start:start + CHUNK_ROWS]
+        c0, c1 = _line_counts(chunk, incidence)
+        win0 = (c0 == board_size).any(axis=1)
+        win1 = (c1 == board_size).any(axis=1)
+        winners[start:start + CHUNK_ROWS] = np.where(win0, 0, np.where(win1, 1, -1))
+    return winners
@@ -1,60 +1,181 @@
+import copy
 import math
 import random
+from itertools import product
+
+if hasattr(int, 'bit_count'):
+    def popcount(mask):
+        return mask.bit_count()
+else:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+ZOBRIST_SEED = 0x3D71C
+
+# static tables per board size, shared by every game of that size
+_TABLE_CACHE = {}
+
+
+class BoardView:
+    """Read-only ``board[z][y][x]`` view over the game's bitboards.
+
+    Cells read as ``0``/``1`` for the owning player and ``-1`` when empty,
+    exactly like the nested lists the game used to store.
+    """
+
+    def __init__(self, game):
+        self.game = game
+
+    def __len__(self):
+        return self.game.BOARD_SIZE
+
+    def __getitem__(self, z):
+        if not 0 <= z < self.game.BOARD_SIZE:
+            raise IndexError('layer index out of range')
+        return _LayerView(self.game, z)
+
+    def __iter__(self):
+        for z in range(self.game.BOARD_SIZE):
+            yield _LayerView(self.game, z)
+
+    def to_list(self):
+        return [[list(row) for row in layer] for layer in self]
+
+
+class _LayerView:
+    def __init__(self, game, z):
+        self.game = game
+        self.z = z
+
+    def __len__(self):
+        return self.game.BOARD_SIZE
+
+    def __getitem__(self, y):
+        N = self.game.BOARD_SIZE
+        if not 0 <= y < N:
+            raise IndexError('row index out of range')
+        p0, p1 = self.game.bitboards
+        base = N * (y + N * self.z)
+        row = []
+        for x in range(N):
+            bit = 1 << (base + x)
+            row.append(0 if p0 & bit else 1 if p1 & bit else -1)
+        return row
+
+    def __iter__(self):
+        for y in range(self.game.BOARD_SIZE):
+            yield self[y]
+
 
 class CubicGame:
     def __init__(self, board_size=4):
         self.BOARD_SIZE = board_size
+        self.NUM_CELLS = board_size ** 3
+        self.FULL_MASK = (1 << self.NUM_CELLS) - 1
         self.board = self.create_board()
+        tables = _TABLE_CACHE.get(board_size)
+        if tables is None:
+            tables = _TABLE_CACHE[board_size] = self.build_tables()
+        # never modified, so all games of a size can share them
+        vars(self).update(tables)
+        self.reset()
+
+    def build_tables(self):
+        """Static lookup tables of this board size, as attribute -> value"""
+        self.cell_coords = [(x, y, z)
+                            for z in range(self.BOARD_SIZE)
+                            for y in range(self.BOARD_SIZE)
+                            for x in range(self.BOARD_SIZE)]
         self.winning_lines = self.generate_winning_lines()
+        self.line_masks = [self.coords_mask(line) for line in self.winning_lines]
+        self.cell_lines = self.generate_cell_lines()
         self.center_cells = self.generate_center_cells()
+        self.cell_weights = self.generate_cell_weights()
+        self.line_values = self.generate_line_values()
+        self.zobrist, self.zobrist_side = self.generate_zobrist_keys()
+        names = ('cell_coords', 'winning_lines', 'line_masks', 'cell_lines', 'center_cells',
+                 'cell_weights', 'line_values', 'zobrist', 'zobrist_side')
+        return {name: getattr(self, name) for name in names}
+
+    def reset(self):
+        """Empty the board"""
+        # one bitboard per player, bit index = x + N*y + N*N*z
+        self.bitboards = [0, 0]
+        # incremental evaluation state read by AIPlayer.heuristic
+        self.line_counts = [[0] * len(self.winning_lines), [0] * len(self.winning_lines)]
+        self.positional = [0, 0]
+        self.potential = [0, 0]
+        self.move_count = 0
+        # Zobrist hash of the stones on the board, updated by make/undo
+        self.hash = 0
+
+    def position(self):
+        """Compact form of the position: the two player bitboards"""
+        return self.bitboards[0], self.bitboards[1]
+
+    def set_position(self, p0, p1):
+        """Load a position from its two bitboards, rebuilding all derived state"""
+        self.reset()
+        for player, mask in ((0, p0), (1, p1)):
+            while mask:
+                low = mask & -mask
+                self.make_move(*self.cell_coords[low.bit_length() - 1], player)
+                mask ^= low
+
+    def copy(self):
+        """Independent copy of the position; the static tables are shared"""
+        clone = copy.copy(self)
+        clone.board = clone.create_board()
+        clone.bitboards = list(self.bitboards)
+        clone.line_counts = [list(counts) for counts in self.line_counts]
+        clone.positional = list(self.positional)
+        clone.potential = list(self.potential)
+        return clone
 
     def create_board(self):
-        return [[[-1 for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)] for __ in range(self.BOARD_SIZE)]
+        return BoardView(self)
+
+    def cell_index(self, x, y, z):
+        return x + self.BOARD_SIZE * (y + self.BOARD_SIZE * z)
+
+    def coords_mask(self, cells):
+        mask = 0
+        for (x, y, z) in cells:
+            mask |= 1 << self.cell_index(x, y, z)
+        return mask
 
     def generate_winning_lines(self):
-        raw = []
-        for z in range(self.BOARD_SIZE):
-            for y in range(self.BOARD_SIZE):
-                raw.append([(x, y, z) for x in range(self.BOARD_SIZE)])
-            for x in range(self.BOARD_SIZE):
-                raw.append([(x, y, z) for y in range(self.BOARD_SIZE)])
-        for x in range(self.BOARD_SIZE):
-            for y in range(self.BOARD_SIZE):
-                raw.append([(x, y, z) for z in range(self.BOARD_SIZE)])
-
-        for z in range(self.BOARD_SIZE):
-            raw.append([(i, i, z) for i in range(self.BOARD_SIZE)])
-            raw.append([(i, self.BOARD_SIZE-1-i, z) for i in range(self.BOARD_SIZE)])
-        for x in range(self.BOARD_SIZE):
-            raw.append([(x, i, i) for i in range(self.BOARD_SIZE)])
-            raw.append([(x, i, self.BOARD_SIZE-1-i) for i in range(self.BOARD_SIZE)])
-        for y in range(self.BOARD_SIZE):
-            raw.append([(i, y, i) for i in range(self.BOARD_SIZE)])
-            raw.append([(i, y, self.BOARD_SIZE-1-i) for i in range(self.BOARD_SIZE)])
-
-        raw.append([(i, i, i) for i in range(self.BOARD_SIZE)])
-        raw.append([(i, i, self.BOARD_SIZE-1-i) for i in range(self.BOARD_SIZE)])
-        raw.append([(i, self.BOARD_SIZE-1-i, i) for i in range(self.BOARD_SIZE)])
-        raw.append([(self.BOARD_SIZE-1-i, i, i) for i in range(self.BOARD_SIZE)])
+        """Every run of N cells in a row, 3N^2 + 6N + 4 lines in all.
 
+        A line follows one of the 13 directions (dx, dy, dz) in {-1, 0, 1}^3
+        whose first non-zero step is +1: 3 along the axes, 6 diagonals
+        within a plane and 4 space diagonals. Along a +1 step the line
+        starts at 0, along a -1 step at N-1, and along a zero step it can
+        sit at any of the N coordinates."""
+        N = self.BOARD_SIZE
+        directions = [d for d in product((0, 1, -1), repeat=3)
+                      if any(d) and next(c for c in d if c) == 1]
+        # axes first, then plane diagonals, then space diagonals
+        directions.sort(key=lambda d: sum(map(abs, d)))
         lines = []
-        for line in raw:
-            if len(line) < self.BOARD_SIZE:
-                continue
-            dx = line[1][0] - line[0][0]
-            dy = line[1][1] - line[0][1]
-            dz = line[1][2] - line[0][2]
-            valid = True
-            for i in range(1, len(line)):
-                if (line[i][0] - line[i-1][0] != dx or
-                    line[i][1] - line[i-1][1] != dy or
-                    line[i][2] - line[i-1][2] != dz):
-                    valid = False
-                    break
-            if valid:
-                lines.append(line)
+        for dx, dy, dz in directions:
+            starts = [range(N) if step == 0 else (0 if step == 1 else N - 1,)
+                      for step in (dx, dy, dz)]
+            for z0 in starts[2]:
+                for y0 in starts[1]:
+                    for x0 in starts[0]:
+                        lines.append([(x0 + i * dx, y0 + i * dy, z0 + i * dz) for i in range(N)])
         return lines
 
+    def generate_cell_lines(self):
+        """For every cell index, the indices of the winning lines through it."""
+        cell_lines = [[] for _ in range(self.NUM_CELLS)]
+        for i, line in enumerate(self.winning_lines):
+            for (x, y, z) in line:
+                cell_lines[self.cell_index(x, y, z)].append(i)
+        return cell_lines
+
     def generate_center_cells(self):
         mid = self.BOARD_SIZE // 2
         coords = []
@@ -64,21 +185,119 @@ class CubicGame:
             coords = [mid]
         return [(x, y, z) for x in coords for y in coords for z in coords]
 
+    def layer_weights(self):
+        """Heuristic weight of each z layer; middle layers are worth more."""
+        N = self.BOARD_SIZE
+        if N == 4:
+            return [1, 3, 3, 1]
+        if N == 3:
+            return [1, 2, 1]
+        return [1 + 2 * min(z, N - 1 - z) for z in range(N)]
+
+    def generate_cell_weights(self):
+        """Positional value of each cell: layer control plus edge/corner bonus."""
+        N = self.BOARD_SIZE
+        max_idx = N - 1
+        layer_weights = self.layer_weights()
+        weights = []
+        for (x, y, z) in self.cell_coords:
+            w = layer_weights[z] * 5
+            if x in (0, max_idx) and y in (0, max_idx) and z in (0, max_idx):
+                w += 25
+            elif x in (0, max_idx) or y in (0, max_idx) or z in (0, max_idx):
+                w += 15
+            weights.append(w)
+        return weights
+
+    def generate_line_values(self):
+        """Value of an unblocked line indexed by how many stones it holds."""
+        values = [0]
+        for c in range(1, self.BOARD_SIZE + 1):
+            value = 10 ** (c + 1)
+            if c == self.BOARD_SIZE - 1:
+                value *= 10
+            values.append(value)
+        return values
+
+    def generate_zobrist_keys(self):
+        """Random 64-bit keys per (player, cell) plus one for the side to move.
+
+        Seeded so that hashes are stable across runs and processes."""
+        rng = random.Random(ZOBRIST_SEED + self.BOARD_SIZE)
+        keys = [[rng.getrandbits(64) for _ in range(self.NUM_CELLS)] for _ in range(2)]
+        return keys, rng.getrandbits(64)
+
+    def empty_mask(self):
+        return self.FULL_MASK & ~(self.bitboards[0] | self.bitboards[1])
+
     def get_available_moves(self):
-        return [(x, y, z)
-                for z in range(self.BOARD_SIZE)
-                for y in range(self.BOARD_SIZE)
-                for x in range(self.BOARD_SIZE)
-                if self.board[z][y][x] == -1]
+        # ascending bit order is the same z/y/x scan order as the list board
+        coords = self.cell_coords
+        moves = []
+        empty = self.empty_mask()
+        while empty:
+            low = empty & -empty
+            moves.append(coords[low.bit_length() - 1])
+            empty ^= low
+        return moves
 
     def make_move(self, x, y, z, player):
-        self.board[z][y][x] = player
+        idx = x + self.BOARD_SIZE * (y + self.BOARD_SIZE * z)
+        self.bitboards[player] |= 1 << idx
+        self.hash ^= self.zobrist[player][idx]
+        self.move_count += 1
+        self.positional[player] += self.cell_weights[idx]
+        own = self.line_counts[player]
+        opp = self.line_counts[1 - player]
+        values = self.line_values
+        potential = self.potential
+        for i in self.cell_lines[idx]:
+            c = own[i]
+            own[i] = c + 1
+            if opp[i] == 0:
+                potential[player] += values[c + 1] - values[c]
+            elif c == 0:
+                # the line was open for the opponent and is now blocked
+                potential[1 - player] -= values[opp[i]]
 
     def undo_move(self, x, y, z):
-        self.board[z][y][x] = -1
+        idx = x + self.BOARD_SIZE * (y + self.BOARD_SIZE * z)
+        bit = 1 << idx
+        if self.bitboards[0] & bit:
+            player = 0
+        elif self.bitboards[1] & bit:
+            player = 1
+        else:
+            return
+        self.bitboards[player] ^= bit
+        self.hash ^= self.zobrist[player][idx]
+        self.move_count -= 1
+        self.positional[player] -= self.cell_weights[idx]
+        own = self.line_counts[player]
+        opp = self.line_counts[1 - player]
+        values = self.line_values
+        potential = self.potential
+        for i in self.cell_lines[idx]:
+            c = own[i] - 1
+            own[i] = c
+            if opp[i] == 0:
+                potential[player] -= values[c + 1] - values[c]
+            elif c == 0:
+                potential[1 - player] += values[opp[i]]
 
     def check_winner(self, player):
-        for line in self.winning_lines:
-            if all(self.board[z][y][x] == player for (x, y, z) in line):
+        mask = self.bitboards[player]
+        for line, line_mask in zip(self.winning_lines, self.line_masks):
+            if mask & line_mask == line_mask:
                 return True, line
+        return False, None
+
+    def check_win_at(self, x, y, z, player):
+        """Check only the lines through (x, y, z), i.e. whether the move just
+        played there won the game for `player`."""
+        mask = self.bitboards[player]
+        line_masks = self.line_masks
+        for i in self.cell_lines[x + self.BOARD_SIZE * (y + self.BOARD_SIZE * z)]:
+            if mask & line_masks[i] == line_masks[i]:
+                return True, self.winning_lines[i]
         return False, None
\ No newline at end of file
@@ -0,0 +1,156 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from models.cubic_game import CubicGame
+from models.symmetry import BoardSymmetry
+
+BOOK_MAGIC = b'CXBK'
+BOOK_VERSION = 1
+# magic, version, board size, record count
+HEADER = struct.Struct('<4sHHI')
+# canonical position hash, score, move cell (canonical frame), search depth
+RECORD = struct.Struct('<QqHH')
+
+DEFAULT_BOOK_PATH = os.path.join('data', 'opening_book.bin')
+
+
+class OpeningBook:
+    """Read-only opening book backed by a memory-mapped file.
+
+    The file is a header followed by fixed-size records sorted by the
+    canonical hash of the position (player 0, the AI, to move), so a lookup
+    is a binary search over the mapping and every process using the same
+    file shares one copy of it through the page cache.
+    """
+
+    def __init__(self, path, game):
+        self.path = path
+        self.game = game
+        # the book is keyed with the same symmetry group the search uses
+        self.symmetry = BoardSymmetry(game, game.cell_weights)
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f'{path} is not an opening book')
+        magic, version, board_size, count = HEADER.unpack_from(self._map, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self.close()
+            raise ValueError(f'{path} is not an opening book')
+        if board_size != game.BOARD_SIZE:
+            self.close()
+            raise ValueError(f'{path} was built for a {board_size}x{board_size}x{board_size} board')
+        if HEADER.size + count * RECORD.size > len(self._map):
+            self.close()
+            raise ValueError(f'{path} is truncated')
+        self.size = count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def record(self, i):
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def find(self, key):
+        """Binary-search the records for `key`; returns the record or None"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rec = self.record(mid)
+            if rec[0] < key:
+                lo = mid + 1
+            elif rec[0] > key:
+                hi = mid
+            else:
+                return rec
+        return None
+
+    def probe(self, game=None):
+        """Book move for the current position, or None when out of book"""
+        game = game or self.game
+        key, t = self.symmetry.canonical_hash(game)
+        rec = self.find(key)
+        if rec is None:
+            return None
+        cell = self.symmetry.inverses[t][rec[2]]
+        if (game.bitboards[0] | game.bitboards[1]) >> cell & 1:
+            return None  # hash collision
+        return game.cell_coords[cell]
+
+
+def build_book(path=DEFAULT_BOOK_PATH, plies=4, depth=4, board_size=4, verbose=False):
+    """Search every symmetry-distinct opening of fewer than `plies` stones and write the book.
+
+    Both move orders are covered: positions where the AI opens and positions
+    where the human does. At each position with the AI to move the book
+    stores the AI's `depth`-ply choice; the opponent's replies are then all
+    expanded, one per symmetry class.
+    """
+    from models.ai_logic import AIPlayer
+
+    game = CubicGame(board_size)
+    ai = AIPlayer(game, depth=depth)
+    symmetry = BoardSymmetry(game, game.cell_weights)
+    records = {}
+    start = time.perf_counter()
+
+    def ai_to_move(ply):
+        if ply >= plies or game.check_winner(0)[0] or game.check_winner(1)[0]:
+            return
+        key, t = symmetry.canonical_hash(game)
+        if key in records:
+            return
+        mv = ai.get_best_move(max_depth=depth)
+        if mv is None:
+            return
+        score = ai.last_score
+        records[key] = (key, score, symmetry.transforms[t][game.cell_index(*mv)], depth)
+        if verbose:
+            print(f'{len(records):6d} positions  ply {ply}  {time.perf_counter() - start:8.1f}s')
+        game.make_move(*mv, 0)
+        human_to_move(ply + 1)
+        game.undo_move(*mv)
+
+    def human_to_move(ply):
+        if ply + 1 >= plies or game.check_winner(0)[0]:
+            return
+        replies = symmetry.unique_moves(game.get_available_moves(), symmetry.stabilizer(game))
+        for mv in replies:
+            game.make_move(*mv, 1)
+            ai_to_move(ply + 1)
+            game.undo_move(*mv)
+
+    ai_to_move(0)
+    human_to_move(0)
+    write_book(path, board_size, records.values())
+    return len(records)
+
+
+def write_book(path, board_size, records):
+    records = sorted(records)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, board_size, len(records)))
+        for rec in records:
+            f.write(RECORD.pack(*rec))
+    # atomic swap so running games never map a half-written book
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the CubiXpert opening book')
+    parser.add_argument('--out', default=DEFAULT_BOOK_PATH)
+    parser.add_argument('--plies', type=int, default=4, help='opening plies covered by the book')
+    parser.add_argument('--depth', type=int, default=4, help='search depth for every book move')
+    parser.add_argument('--size', type=int, default=4, help='board size')
+    args = parser.parse_args()
+    n = build_book(args.out, args.plies, args.depth, args.size, verbose=True)
+    print(f'wrote {n} positions to {args.out}')
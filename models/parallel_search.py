@@ -0,0 +1,196 @@
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from models.cubic_game import CubicGame
+from models.search_stats import SearchStats
+
+# per-process state of a pool worker
+_shared_alpha = None
+_worker_players = {}
+
+
+def _init_worker(shared_alpha):
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _worker_player(board_size, options):
+    from models.ai_logic import AIPlayer
+
+    key = (board_size, tuple(sorted(options.items())))
+    ai = _worker_players.get(key)
+    if ai is None:
+        ai = AIPlayer(CubicGame(board_size), book_path=None, threat_search=False,
+                      endgame_empties=0, **options)
+        _worker_players[key] = ai
+    return ai
+
+
+def search_root_move(board_size, position, move, depth, alpha, deadline, deterministic, options):
+    """Worker task: value of the AI (player 0) playing `move` in `position`.
+
+    The child is searched with the window (alpha, +inf); a result <= alpha
+    is an upper bound only. Unless deterministic, alpha is raised to the
+    best value any worker has proven so far, at the start and again before
+    each of the child's moves, and a better value proven here is shared in
+    turn. Returns (move, value, exact, stats): value is None when the
+    deadline hit, `exact` is False when it is only such a bound, and
+    stats.pv is the line the worker found, starting with `move`.
+    """
+    from models.ai_logic import SearchTimeout, WIN_SCORE
+
+    ai = _worker_player(board_size, options)
+    game = ai.game
+    game.set_position(*position)
+    if deterministic:
+        # results must not depend on what this worker searched before
+        ai.new_game()
+    ai.nodes = 0
+    ai.stats = SearchStats(ai.timing)
+    ai.deadline = None
+    if deadline is not None:
+        ai.deadline = time.perf_counter() + (deadline - time.time())
+    ai.shared_alpha = None if deterministic else _shared_alpha
+    if ai.shared_alpha is not None:
+        alpha = max(alpha, ai.shared_alpha.value)
+    ai.root_alpha = alpha
+
+    x, y, z = move
+    game.make_move(x, y, z, 0)
+    ai.pv_lines[1] = []
+    if game.check_win_at(x, y, z, 0)[0]:
+        value = WIN_SCORE
+    else:
+        if ai.symmetry is not None:
+            ai.stabilizers[1] = ai.symmetry.stabilizer(game)
+        try:
+            _, value = ai.minimax(depth - 1, False, alpha, math.inf, ply=1)
+        except SearchTimeout:
+            value = None
+    game.undo_move(x, y, z)
+
+    # the search raised ai.root_alpha to every shared value it used
+    exact = value is not None and value > ai.root_alpha
+    if exact and ai.shared_alpha is not None:
+        with ai.shared_alpha.get_lock():
+            if value > ai.shared_alpha.value:
+                ai.shared_alpha.value = value
+    ai.shared_alpha = None
+    ai.stats.nodes = ai.nodes
+    ai.stats.pv = [move] + ai.pv_lines[1]
+    return move, value, exact, ai.stats
+
+
+class ParallelSearch:
+    """Root-splitting search over a process pool, Young Brothers Wait style.
+
+    The eldest (best-ordered) root move is searched first to get a bound;
+    the remaining moves are then searched in parallel with that bound,
+    which workers tighten through a shared value as better moves are
+    proven. With `deterministic=True` the bound stays fixed at the eldest
+    brother's value and worker tables are cleared per task, so the chosen
+    move depends only on the position and the depth.
+    """
+
+    def __init__(self, ai, workers=None, deterministic=False):
+        self.ai = ai
+        self.workers = workers or multiprocessing.cpu_count()
+        self.deterministic = deterministic
+        self.options = {
+            'tt_size_mb': ai.tt.size_mb if ai.tt is not None else 0,
+            'move_ordering': ai.move_ordering,
+            'pvs': ai.pvs,
+            'lmr': ai.lmr,
+            'futility': ai.futility,
+            'threat_extensions': ai.threat_extensions,
+            'symmetry': ai.symmetry is not None,
+            'timing': ai.timing,
+        }
+        context = multiprocessing.get_context()
+        self._shared_alpha = context.Value('d', -math.inf)
+        # worker processes are only spawned by the first submit
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._shared_alpha,),
+        )
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def root_moves(self):
+        ai = self.ai
+        game = ai.game
+        moves = game.get_available_moves()
+        if ai.move_ordering:
+            moves = ai.order_moves(moves, 0, 0, ai.pv_move)
+        if ai.symmetry is not None:
+            moves = ai.symmetry.unique_moves(moves, ai.symmetry.stabilizer(game))
+        return moves
+
+    def search(self, depth, deadline=None):
+        """Best root move, its value at `depth` and the principal variation.
+
+        `deadline` is a time.time() timestamp; SearchTimeout is raised when
+        any move could not be finished before it."""
+        from models.ai_logic import SearchTimeout
+
+        game = self.ai.game
+        moves = self.root_moves()
+        if not moves:
+            return None, self.ai.heuristic(0), []
+        position = game.position()
+        N = game.BOARD_SIZE
+        pool = self._pool
+        self._shared_alpha.value = -math.inf
+
+        def submit(mv, alpha):
+            return pool.submit(search_root_move, N, position, mv, depth, alpha,
+                               deadline, self.deterministic, self.options)
+
+        def collect(pending):
+            # poll so that AIPlayer.stop() is noticed while workers run
+            while True:
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                if done or not pending:
+                    return done, pending
+                if self.ai.stopped:
+                    for fut in pending:
+                        fut.cancel()
+                    raise SearchTimeout
+
+        done, _ = collect({submit(moves[0], -math.inf)})
+        eldest, best_val, _, stats = done.pop().result()
+        if best_val is None:
+            raise SearchTimeout
+        best_mv = eldest
+        best_pv = stats.pv
+        self._shared_alpha.value = best_val
+        futures = {submit(mv, best_val): i for i, mv in enumerate(moves[1:], 1)}
+        results = [None] * len(moves)
+        lines = [None] * len(moves)
+        pending = set(futures)
+        while pending:
+            done, pending = collect(pending)
+            for fut in done:
+                mv, val, exact, worker_stats = fut.result()
+                stats.merge(worker_stats)
+                if val is None:
+                    for other in pending:
+                        other.cancel()
+                    raise SearchTimeout
+                if exact:
+                    # a bound equal to the best value must not win the tie
+                    # against the move that proved it
+                    results[futures[fut]] = val
+                    lines[futures[fut]] = worker_stats.pv
+        # scan in move order so ties always go to the better-ordered move
+        for i in range(1, len(moves)):
+            if results[i] is not None and results[i] > best_val:
+                best_val, best_mv, best_pv = results[i], moves[i], lines[i]
+        self.ai.nodes += stats.nodes
+        self.ai.stats.merge(stats)
+        return best_mv, best_val, best_pv
@@ -0,0 +1,313 @@
+import time
+from collections import namedtuple
+
+WIN = 'win'
+LOSS = 'loss'
+DRAW = 'draw'
+
+# nodes between two clock reads while a deadline is set
+TIME_CHECK_INTERVAL = 256
+
+# proof or disproof number of a solved node
+INF = 1 << 40
+
+# rough footprint of one stored entry (a 5-tuple of small ints) in CPython
+ENTRY_BYTES = 110
+
+# the 1+epsilon trick: a child is searched until its number passes the
+# runner-up's by this factor, not just by one, so the search switches
+# between siblings far less often
+EPSILON_FACTOR = 1.25
+
+# xor-ed into the key when the other player attacks, so the two proofs
+# of a solve never read each other's entries
+ATTACKER_KEY = 0x5BD1E9955BD1E995
+
+# `outcome` for the player to move, reached in `distance` plies along the
+# proof; `move` is the one to play and `moves` all moves keeping the outcome
+Solution = namedtuple('Solution', ['outcome', 'distance', 'move', 'moves'])
+
+
+class SolveAborted(Exception):
+    """Raised inside the solver once a solve has used up its nodes or its
+    time, or was stopped"""
+
+
+class ProofTable:
+    """Fixed-size table of proof and disproof numbers keyed by Zobrist hash.
+
+    Like the search's TranspositionTable every bucket holds two entries:
+    one keeps the entry whose subtree took the most nodes, solved entries
+    above all, and the other always takes the newest entry. Entries are
+    tuples ``(key, pn, dn, distance, work)``.
+    """
+
+    def __init__(self, size_mb=8):
+        self.size_mb = size_mb
+        buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        # power of two so the bucket index is a mask
+        self.num_buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = self.num_buckets - 1
+        self.clear()
+
+    def clear(self):
+        self.costly = [None] * self.num_buckets
+        self.recent = [None] * self.num_buckets
+
+    def probe(self, key):
+        b = key & self.mask
+        entry = self.costly[b]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.recent[b]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, pn, dn, distance, work):
+        if pn == 0 or dn == 0:
+            work = INF
+        b = key & self.mask
+        entry = (key, pn, dn, distance, work)
+        costly = self.costly[b]
+        if costly is None or costly[0] == key or work >= costly[4]:
+            self.costly[b] = entry
+        else:
+            self.recent[b] = entry
+
+
+class ProofNumberSearch:
+    """Depth-first proof-number search (df-pn) that solves endgames exactly.
+
+    One proof asks whether `attacker` can force a win: at OR nodes the
+    attacker moves and one proven child proves the node, at AND nodes the
+    defender moves and every child has to be proven. Proof and disproof
+    numbers count the leaves still needed either way, and the search
+    always descends into the most-proving child, staying in a subtree
+    until its numbers pass the thresholds its parent handed down.
+
+    A position is solved by two proofs: whether the player to move wins,
+    and if not, whether the opponent does; otherwise it is a draw. A side
+    that can complete a line wins at once, a side facing two such cells
+    loses, and a side facing one has to block it. A solve gives up after
+    `max_nodes` nodes, at its deadline or once `stopped` is set; memory
+    stays within the fixed-size table, which persists across solves.
+    """
+
+    def __init__(self, game, size_mb=8, max_nodes=50000, table=None):
+        self.game = game
+        self.max_nodes = max_nodes
+        self.table = table if table is not None else ProofTable(size_mb)
+        self.nodes = 0
+        self.deadline = None
+        self.stopped = False
+
+    def solve(self, player, deadline=None):
+        """Solution for `player` to move, or None when the solve gave up.
+
+        `deadline` is a time.perf_counter() timestamp."""
+        game = self.game
+        self.nodes = 0
+        self.deadline = deadline
+        try:
+            winning = self.proof(player, player)
+            if winning is not None:
+                return self.solution(WIN, winning, min)
+            losing = self.proof(1 - player, player)
+            if losing is not None:
+                return self.solution(LOSS, losing, max)
+            drawing = self.defences(1 - player, player)
+        except SolveAborted:
+            return None
+        moves = [game.cell_coords[c] for c in drawing]
+        return Solution(DRAW, game.NUM_CELLS - game.move_count, moves[0] if moves else None, moves)
+
+    def solution(self, outcome, cells, pick):
+        """Solution from (cell, distance) pairs; `pick` chooses the distance
+        to aim for: the quickest win or the slowest loss"""
+        coords = self.game.cell_coords
+        distance = pick(d for _, d in cells)
+        move = next(coords[c] for c, d in cells if d == distance)
+        return Solution(outcome, distance, move, [coords[c] for c, _ in cells])
+
+    def key(self, attacker, to_move):
+        game = self.game
+        key = game.hash
+        if to_move:
+            key ^= game.zobrist_side
+        if attacker:
+            key ^= ATTACKER_KEY
+        return key
+
+    def candidates(self, attacker, to_move):
+        """Verdict for the side to move when it is immediate, and the cells
+        worth playing: `(outcome, distance, cells)`.
+
+        Completing a line wins in one ply and two open opponent lines lose
+        in two; then the cells are the winning ones, or the blocks that do
+        not help. Once no line is open to the attacker any more it cannot
+        win, which counts as a draw here. Otherwise the outcome is None and
+        the cells are the forced block, or every cell on a line still open
+        to someone: a stone anywhere else is a pass, and with no zugzwang
+        in the game a pass is never better than a move."""
+        game = self.game
+        if game.move_count == game.NUM_CELLS:
+            return DRAW, 0, []
+        target = game.BOARD_SIZE - 1
+        own = game.line_counts[to_move]
+        opp = game.line_counts[1 - to_move]
+        own_open = opp_open = wins = threats = 0
+        for i, line_mask in enumerate(game.line_masks):
+            if opp[i] == 0:
+                own_open |= line_mask
+                if own[i] == target:
+                    wins |= line_mask
+            if own[i] == 0:
+                opp_open |= line_mask
+                if opp[i] == target:
+                    threats |= line_mask
+        empty = game.empty_mask()
+        if wins & empty:
+            return WIN, 1, _bits(wins & empty)
+        if not (own_open if to_move == attacker else opp_open) & empty:
+            return DRAW, 0, _bits((own_open | opp_open) & empty or empty)
+        threats &= empty
+        if threats & (threats - 1):
+            return LOSS, 2, _bits(threats)
+        if threats:
+            return None, 0, [threats.bit_length() - 1]
+        return None, 0, _bits((own_open | opp_open) & empty)
+
+    def proof(self, attacker, to_move):
+        """Whether `attacker` wins with `to_move` to move.
+
+        None when it does not, otherwise the (cell, distance) pairs of the
+        proof: with the attacker to move its winning moves, with the
+        defender to move every defence."""
+        outcome, distance, cells = self.candidates(attacker, to_move)
+        attacking = to_move == attacker
+        if outcome is not None:
+            if outcome != DRAW and (outcome == WIN) == attacking:
+                return [(c, distance) for c in cells]
+            return None
+        key = self.key(attacker, to_move)
+        if self.mid(attacker, to_move, key, INF, INF)[0] != 0:
+            return None
+        children = self.child_entries(to_move, key, cells)
+        if not attacking or not any(pn == 0 for pn, _, _ in children):
+            # the defender's proof needs every child; entries the table
+            # dropped since are solved again
+            if any(pn != 0 for pn, _, _ in children):
+                children = self.solve_children(attacker, to_move, key, cells)
+        return [(c, d + 1) for c, (pn, _, d) in zip(cells, children) if pn == 0]
+
+    def defences(self, attacker, to_move):
+        """Cells from which the defender, to move, keeps `attacker` from
+        winning; only called once the attacker's proof failed"""
+        outcome, _, cells = self.candidates(attacker, to_move)
+        if outcome is not None:
+            return cells
+        key = self.key(attacker, to_move)
+        children = self.child_entries(to_move, key, cells)
+        if not any(dn == 0 for _, dn, _ in children):
+            children = self.solve_children(attacker, to_move, key, cells)
+        return [c for c, (_, dn, _) in zip(cells, children) if dn == 0]
+
+    def child_entries(self, to_move, key, cells):
+        """(pn, dn, distance) of every child, (1, 1, 0) when not stored"""
+        game = self.game
+        table = self.table
+        z = game.zobrist[to_move]
+        side = game.zobrist_side
+        entries = []
+        for c in cells:
+            entry = table.probe(key ^ z[c] ^ side)
+            entries.append((1, 1, 0) if entry is None else entry[1:4])
+        return entries
+
+    def solve_children(self, attacker, to_move, key, cells):
+        """(pn, dn, distance) of every child, each searched until solved"""
+        game = self.game
+        coords = game.cell_coords
+        z = game.zobrist[to_move]
+        children = []
+        for c in cells:
+            x, y, zc = coords[c]
+            game.make_move(x, y, zc, to_move)
+            try:
+                children.append(self.mid(attacker, 1 - to_move, key ^ z[c] ^ game.zobrist_side,
+                                         INF, INF))
+            finally:
+                game.undo_move(x, y, zc)
+        return children
+
+    def mid(self, attacker, to_move, key, th_pn, th_dn):
+        """Search the node until it is solved or its proof number reaches
+        `th_pn` or its disproof number `th_dn`; returns (pn, dn, distance)"""
+        game = self.game
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SolveAborted
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.stopped or (self.deadline is not None and time.perf_counter() > self.deadline):
+                raise SolveAborted
+        start = self.nodes
+        attacking = to_move == attacker
+        outcome, distance, cells = self.candidates(attacker, to_move)
+        if outcome is not None:
+            if outcome != DRAW and (outcome == WIN) == attacking:
+                pn, dn = 0, INF
+            else:
+                pn, dn, distance = INF, 0, 0
+            self.table.store(key, pn, dn, distance, 1)
+            return pn, dn, distance
+
+        coords = game.cell_coords
+        z = game.zobrist[to_move]
+        side = game.zobrist_side
+        while True:
+            entries = self.child_entries(to_move, key, cells)
+            # the attacker's node is as close to proven as its best child
+            # and the defender's as close to disproven; `first` is that
+            # child, `second` the runner-up's number
+            if attacking:
+                numbers = [e[0] for e in entries]
+                pn = min(numbers)
+                dn = min(INF, sum(e[1] for e in entries))
+            else:
+                numbers = [e[1] for e in entries]
+                dn = min(numbers)
+                pn = min(INF, sum(e[0] for e in entries))
+            distance = 0
+            if pn == 0:
+                distances = [e[2] for e in entries if e[0] == 0]
+                distance = 1 + (min(distances) if attacking else max(distances))
+            if pn == 0 or dn == 0 or pn >= th_pn or dn >= th_dn:
+                break
+            first = numbers.index(min(numbers))
+            second = min(numbers[:first] + numbers[first + 1:], default=INF)
+            child_pn, child_dn = entries[first][:2]
+            if attacking:
+                child_th_pn = min(th_pn, int(second * EPSILON_FACTOR) + 1)
+                child_th_dn = min(INF, th_dn - dn + child_dn)
+            else:
+                child_th_dn = min(th_dn, int(second * EPSILON_FACTOR) + 1)
+                child_th_pn = min(INF, th_pn - pn + child_pn)
+            c = cells[first]
+            x, y, zc = coords[c]
+            game.make_move(x, y, zc, to_move)
+            try:
+                self.mid(attacker, 1 - to_move, key ^ z[c] ^ side, child_th_pn, child_th_dn)
+            finally:
+                game.undo_move(x, y, zc)
+        self.table.store(key, pn, dn, distance, self.nodes - start)
+        return pn, dn, distance
+
+
+def _bits(mask):
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
@@ -0,0 +1,101 @@
+import time
+
+
+class SearchStats:
+    """What one AIPlayer search did.
+
+    Counters are filled in as the search runs; with `timed` it also sums
+    the perf_counter time spent generating and ordering moves, detecting
+    wins and evaluating leaves, which costs some speed. `source` says
+    where the move came from: 'book', 'threat', 'endgame', 'cache' or
+    'search'.
+    """
+
+    COUNTERS = ('nodes', 'leaf_evals', 'beta_cutoffs', 'first_move_cutoffs',
+                'tt_probes', 'tt_hits', 'tt_cutoffs', 'pvs_researches',
+                'aspiration_researches', 'lmr_reductions', 'lmr_researches',
+                'futility_prunes', 'extensions')
+    TIMERS = ('time_movegen', 'time_win_check', 'time_eval')
+
+    def __init__(self, timed=False):
+        self.timed = timed
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        # null-window searches that had to be repeated with the full window,
+        # and root searches repeated after failing their aspiration window
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        # selective search: moves searched a ply shallower first and how
+        # many of them had to be searched again in full, quiet moves skipped
+        # above the leaves, and threat moves searched a ply deeper
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_prunes = 0
+        self.extensions = 0
+        self.time_movegen = 0.0
+        self.time_win_check = 0.0
+        self.time_eval = 0.0
+        self.source = None
+        self.move = None
+        self.score = None
+        # principal variation: the moves both sides are expected to play
+        self.pv = []
+        self.depth_reached = 0
+        self.elapsed = 0.0
+        # (depth, move, score, nodes, elapsed) of every completed iteration
+        self.iterations = []
+        self.started = time.perf_counter()
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of beta cutoffs caused by the first move searched"""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def record_iteration(self, depth, move, score, nodes):
+        """Note a completed depth; the search result so far is that depth's"""
+        self.elapsed = time.perf_counter() - self.started
+        self.depth_reached = depth
+        self.move = move
+        self.score = score
+        self.nodes = nodes
+        self.iterations.append((depth, move, score, nodes, self.elapsed))
+
+    def merge(self, other):
+        """Add the counters and timers of another search, e.g. a worker's"""
+        for name in self.COUNTERS + self.TIMERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.COUNTERS}
+        if self.timed:
+            data.update((name, getattr(self, name)) for name in self.TIMERS)
+        data.update(
+            source=self.source,
+            move=self.move,
+            score=self.score,
+            pv=self.pv,
+            depth_reached=self.depth_reached,
+            elapsed=self.elapsed,
+            nps=self.nps,
+            first_move_cutoff_rate=self.first_move_cutoff_rate,
+            tt_hit_rate=self.tt_hit_rate,
+            iterations=self.iterations,
+        )
+        return data
+
+    def __repr__(self):
+        return (f'SearchStats(source={self.source!r}, move={self.move}, score={self.score}, '
+                f'depth={self.depth_reached}, nodes={self.nodes}, elapsed={self.elapsed:.3f}s)')
@@ -0,0 +1,177 @@
+from itertools import permutations, product
+
+# transforms per board size and cell weights, they only depend on those
+_TRANSFORM_CACHE = {}
+
+
+def generate_transforms(board_size, cell_weights=None):
+    """Every permutation of cells that maps winning lines onto winning lines.
+
+    Candidates are the 48 rotations/reflections of the cube combined with
+    the maps that act the same way on all three coordinates by permuting
+    the pairs {i, N-1-i} (and flipping inside a pair); for the 4x4x4 board
+    that includes the inner/outer swap and yields 192 automorphisms.
+    Each transform is a tuple `perm` with `perm[cell] -> image cell`.
+
+    With `cell_weights` only the transforms mapping every cell onto a cell
+    of equal weight are returned. A candidate is dropped at its first
+    mismatching cell, which keeps large boards cheap: there are 18432
+    candidates at 8x8x8, and almost all of them fail within a few cells.
+    """
+    key = (board_size, None if cell_weights is None else tuple(cell_weights))
+    if key in _TRANSFORM_CACHE:
+        return _TRANSFORM_CACHE[key]
+    from models.cubic_game import CubicGame
+    game = CubicGame(board_size)
+    N = board_size
+    lines = set(game.line_masks)
+    line_cells = [[game.cell_index(*c) for c in line] for line in game.winning_lines]
+    coords = game.cell_coords
+    strides = (1, N, N * N)
+
+    pairs = [(i, N - 1 - i) for i in range(N // 2)]
+    coord_maps = []
+    for order in permutations(range(len(pairs))):
+        for flips in product((False, True), repeat=len(pairs)):
+            m = list(range(N))
+            for (a, b), j, flip in zip(pairs, order, flips):
+                c, d = pairs[j]
+                if flip:
+                    c, d = d, c
+                m[a], m[b] = c, d
+            coord_maps.append(tuple(m))
+
+    seen = set()
+    transforms = []
+    for axes in permutations(range(3)):
+        for reflect in product((False, True), repeat=3):
+            for cmap in coord_maps:
+                # offset[a][v]: what source coordinate v on axis a adds to the
+                # image cell index once mapped, reflected and moved to its axis
+                offset = [None, None, None]
+                for k in range(3):
+                    mapped = [N - 1 - cmap[v] if reflect[k] else cmap[v] for v in range(N)]
+                    offset[axes[k]] = [v * strides[k] for v in mapped]
+                perm = _candidate(offset, coords, cell_weights)
+                if perm is None or perm in seen:
+                    continue
+                seen.add(perm)
+                if all(_cells_mask(perm, cells) in lines for cells in line_cells):
+                    transforms.append(perm)
+    # identity first, so the canonical transform of a symmetric-free position is 0
+    identity = tuple(range(game.NUM_CELLS))
+    transforms.remove(identity)
+    transforms.insert(0, identity)
+    _TRANSFORM_CACHE[key] = transforms
+    return transforms
+
+
+def _candidate(offset, coords, cell_weights):
+    """Cell permutation given by the per-axis offsets, or None as soon as a
+    cell would land on a cell of different weight"""
+    ox, oy, oz = offset
+    if cell_weights is None:
+        return tuple([ox[x] + oy[y] + oz[z] for (x, y, z) in coords])
+    perm = []
+    for w, (x, y, z) in zip(cell_weights, coords):
+        dst = ox[x] + oy[y] + oz[z]
+        if cell_weights[dst] != w:
+            return None
+        perm.append(dst)
+    return tuple(perm)
+
+
+def _cells_mask(perm, cells):
+    mask = 0
+    for c in cells:
+        mask |= 1 << perm[c]
+    return mask
+
+
+def _bits(mask):
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+class BoardSymmetry:
+    """Symmetry helpers for a CubicGame: canonical hashes and move orbits.
+
+    With `cell_weights` only the transforms that map every cell onto a cell
+    of equal weight are kept, i.e. the subgroup under which an evaluation
+    built from those weights is invariant. Without it all automorphisms of
+    the winning lines are used, which preserves game-theoretic values only.
+    """
+
+    def __init__(self, game, cell_weights=None):
+        self.game = game
+        self.transforms = generate_transforms(game.BOARD_SIZE, cell_weights)
+        self.inverses = []
+        for perm in self.transforms:
+            inv = [0] * len(perm)
+            for src, dst in enumerate(perm):
+                inv[dst] = src
+            self.inverses.append(tuple(inv))
+
+    def transform_mask(self, t, mask):
+        """Image of a cell bitmask under transform number `t`"""
+        perm = self.transforms[t]
+        out = 0
+        for c in _bits(mask):
+            out |= 1 << perm[c]
+        return out
+
+    def canonical_hash(self, game=None):
+        """Smallest Zobrist hash over all symmetric images of the position.
+
+        Returns `(hash, t)` where transform `t` maps the position onto the
+        image with that hash; symmetric positions share the same hash."""
+        game = game or self.game
+        z0, z1 = game.zobrist
+        cells0 = _bits(game.bitboards[0])
+        cells1 = _bits(game.bitboards[1])
+        best, best_t = None, 0
+        for t, perm in enumerate(self.transforms):
+            h = 0
+            for c in cells0:
+                h ^= z0[perm[c]]
+            for c in cells1:
+                h ^= z1[perm[c]]
+            if best is None or h < best:
+                best, best_t = h, t
+        return best, best_t
+
+    def stabilizer(self, game=None):
+        """Indices of the transforms that leave the position unchanged"""
+        game = game or self.game
+        p0, p1 = game.bitboards
+        return [t for t in range(len(self.transforms))
+                if self.transform_mask(t, p0) == p0 and self.transform_mask(t, p1) == p1]
+
+    def unique_moves(self, moves, stabilizer):
+        """Keep one representative per orbit of `moves` under `stabilizer`.
+
+        Moves keep their relative order; the first move of each orbit is
+        the one that survives."""
+        if len(stabilizer) <= 1:
+            return moves
+        game = self.game
+        perms = [self.transforms[t] for t in stabilizer]
+        seen = set()
+        unique = []
+        for mv in moves:
+            idx = game.cell_index(*mv)
+            if idx in seen:
+                continue
+            unique.append(mv)
+            for perm in perms:
+                seen.add(perm[idx])
+        return unique
+
+    def child_stabilizer(self, stabilizer, mv):
+        """Transforms of `stabilizer` that still fix the position after `mv`"""
+        idx = self.game.cell_index(*mv)
+        return [t for t in stabilizer if self.transforms[t][idx] == idx]
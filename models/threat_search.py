@@ -0,0 +1,165 @@
+import time
+from collections import namedtuple
+
+FORCED_WIN = 'win'
+FORCED_LOSS = 'loss'
+
+# nodes between two clock reads while a deadline is set
+TIME_CHECK_INTERVAL = 64
+
+# `sequence` alternates attacker and defender moves, attacker first
+ThreatResult = namedtuple('ThreatResult', ['outcome', 'sequence'])
+
+
+class ThreatSearchAborted(Exception):
+    """Raised inside the search once its deadline has passed or it was
+    stopped"""
+
+
+class ThreatSpaceSearch:
+    """Search only forcing moves for a win by a chain of threats.
+
+    A threat is a line holding N-1 of the attacker's stones and an empty
+    cell; the defender has to block it at once. The attacker only plays
+    moves that make a threat (or that block an opponent threat while making
+    one), the defender only plays the forced block, and the attacker wins
+    on a double threat. The tiny branching factor lets this look 15-20
+    plies ahead where the full-width search sees 2-4. A search gives up,
+    reporting nothing found, after `max_nodes` nodes, at its deadline or
+    once `stopped` is set.
+    """
+
+    def __init__(self, game, max_plies=20, max_nodes=50000):
+        self.game = game
+        self.max_plies = max_plies
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.failed = {}
+        self.deadline = None
+        self.stopped = False
+
+    def threat_mask(self, player):
+        """Empty cells that would complete a line for `player`"""
+        game = self.game
+        target = game.BOARD_SIZE - 1
+        own = game.line_counts[player]
+        opp = game.line_counts[1 - player]
+        mask = 0
+        for i, line_mask in enumerate(game.line_masks):
+            if own[i] == target and opp[i] == 0:
+                mask |= line_mask
+        return mask & game.empty_mask()
+
+    def threat_making_mask(self, player):
+        """Empty cells where `player` would create a new threat"""
+        game = self.game
+        target = game.BOARD_SIZE - 2
+        own = game.line_counts[player]
+        opp = game.line_counts[1 - player]
+        mask = 0
+        for i, line_mask in enumerate(game.line_masks):
+            if own[i] == target and opp[i] == 0:
+                mask |= line_mask
+        return mask & game.empty_mask()
+
+    def find_win(self, player, deadline=None):
+        """Forcing sequence winning for `player` with `player` to move, or
+        None; `deadline` is a time.perf_counter() timestamp"""
+        self.nodes = 0
+        self.failed = {}
+        self.deadline = deadline
+        # analyse() runs one search per move, most far below the check interval
+        if self.out_of_time():
+            return None
+        try:
+            return self._attack(player, self.max_plies)
+        except ThreatSearchAborted:
+            return None
+
+    def out_of_time(self):
+        return self.stopped or (self.deadline is not None and time.perf_counter() > self.deadline)
+
+    def analyse(self, player, deadline=None):
+        """Threat-space verdict for `player` to move.
+
+        A ThreatResult with FORCED_WIN and the winning line of play, with
+        FORCED_LOSS when every move leaves the opponent a forced win (the
+        sequence is the opponent's line against the first move tried), or
+        None when neither side has a forced sequence within reach or the
+        search ran out of time first."""
+        seq = self.find_win(player, deadline)
+        if seq is not None:
+            return ThreatResult(FORCED_WIN, seq)
+        game = self.game
+        opponent = 1 - player
+        if self.find_win(opponent, deadline) is None:
+            return None
+        # the opponent wins if we pass; see whether any move stops it
+        refutation = None
+        for mv in game.get_available_moves():
+            game.make_move(*mv, player)
+            seq = self.find_win(opponent, deadline)
+            game.undo_move(*mv)
+            if seq is None:
+                return None
+            if refutation is None:
+                refutation = [mv] + seq
+        return ThreatResult(FORCED_LOSS, refutation)
+
+    def _attack(self, player, plies_left):
+        game = self.game
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0 and self.out_of_time():
+            raise ThreatSearchAborted
+        if self.nodes > self.max_nodes or plies_left < 1:
+            return None
+        coords = game.cell_coords
+        wins = self.threat_mask(player)
+        if wins:
+            return [coords[(wins & -wins).bit_length() - 1]]
+        if plies_left < 3:
+            return None
+        key = game.hash ^ (game.zobrist_side if player else 0)
+        if self.failed.get(key, -1) >= plies_left:
+            return None
+
+        opponent = 1 - player
+        blocks = self.threat_mask(opponent)
+        if blocks:
+            if blocks & (blocks - 1):
+                return None  # two opponent threats cannot both be blocked
+            candidates = blocks
+        else:
+            candidates = self.threat_making_mask(player)
+
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            x, y, z = coords[low.bit_length() - 1]
+            game.make_move(x, y, z, player)
+            try:
+                threats = self.threat_mask(player)
+                if threats & (threats - 1):
+                    # double threat: the defender blocks one, we play the other
+                    first = threats & -threats
+                    second = threats ^ first
+                    second &= -second
+                    return [(x, y, z), coords[first.bit_length() - 1], coords[second.bit_length() - 1]]
+                if threats:
+                    bx, by, bz = coords[threats.bit_length() - 1]
+                    game.make_move(bx, by, bz, opponent)
+                    try:
+                        seq = None
+                        if not game.check_win_at(bx, by, bz, opponent)[0]:
+                            seq = self._attack(player, plies_left - 2)
+                    finally:
+                        # an aborted search unwinds through here as well
+                        game.undo_move(bx, by, bz)
+                    if seq is not None:
+                        return [(x, y, z), (bx, by, bz)] + seq
+            finally:
+                game.undo_move(x, y, z)
+
+        self.failed[key] = plies_left
+        return None
+
@@ -0,0 +1,54 @@
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# rough footprint of one stored entry (a 6-tuple of small ints) in CPython
+ENTRY_BYTES = 120
+
+
+class TranspositionTable:
+    """Fixed-size transposition table keyed by Zobrist hash.
+
+    Every bucket holds two entries: a depth-preferred slot that is only
+    replaced by an equal or deeper search (or by anything once its entry
+    belongs to an older search), and an always-replace slot that takes
+    whatever did not go into the first one. Entries are tuples
+    ``(key, depth, value, flag, move, generation)``.
+    """
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        # power of two so the bucket index is a mask
+        self.num_buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = self.num_buckets - 1
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.deep = [None] * self.num_buckets
+        self.recent = [None] * self.num_buckets
+
+    def new_search(self):
+        """Age the table so entries from earlier moves can be replaced."""
+        self.generation += 1
+
+    def probe(self, key):
+        b = key & self.mask
+        entry = self.deep[b]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.recent[b]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, value, flag, move):
+        b = key & self.mask
+        entry = (key, depth, value, flag, move, self.generation)
+        deep = self.deep[b]
+        if (deep is None or deep[0] == key or depth >= deep[1]
+                or deep[5] != self.generation):
+            self.deep[b] = entry
+        else:
+            self.recent[b] = entry
@@ -0,0 +1,154 @@
+"""Micro-benchmarks of the board primitives for several board sizes.
+
+Each primitive is timed in isolation on an empty, a half-filled and a
+full board of every size. A sample runs the primitive in a loop long
+enough to last --min-time seconds; ops/sec is reported as the mean over
+--samples samples with a 95% confidence interval.
+
+    python -m tests.bench_primitives
+    python -m tests.bench_primitives --sizes 4 --primitive heuristic
+    python -m tests.bench_primitives --out primitives.json --profile primitives.prof
+
+The --profile dump is a regular cProfile file: `python -m pstats` reads
+it, and tools such as snakeviz or flameprof render it as a flame graph.
+"""
+import argparse
+import cProfile
+import json
+import math
+import pstats
+import random
+import statistics
+import sys
+import time
+
+from models.cubic_game import CubicGame
+from models.ai_logic import AIPlayer
+
+BOARDS = ('empty', 'mid', 'full')
+
+# two-sided 95% Student t quantiles by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+        8: 2.306, 9: 2.262, 10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042}
+
+
+def t_quantile(df):
+    if df in T_95:
+        return T_95[df]
+    smaller = [d for d in T_95 if d < df]
+    return T_95[max(smaller)] if df <= 30 else 1.96
+
+
+def make_board(board_size, kind, seed=0):
+    """Empty board, or one with half / all of the cells filled alternately"""
+    game = CubicGame(board_size)
+    cells = list(game.cell_coords)
+    random.Random(seed).shuffle(cells)
+    count = {'empty': 0, 'mid': len(cells) // 2, 'full': len(cells)}[kind]
+    for i, (x, y, z) in enumerate(cells[:count]):
+        game.make_move(x, y, z, i % 2)
+    return game
+
+
+def primitives(game, ai):
+    """Name -> zero-argument callable running one operation on `game`"""
+    # a free cell is played and taken back; on a full board a stone is
+    # taken back and replayed, so every call leaves the board unchanged
+    moves = game.get_available_moves()
+    if moves:
+        x, y, z = moves[len(moves) // 2]
+
+        def make_undo():
+            game.make_move(x, y, z, 0)
+            game.undo_move(x, y, z)
+    else:
+        x, y, z = game.cell_coords[game.NUM_CELLS // 2]
+        player = 0 if game.bitboards[0] >> game.cell_index(x, y, z) & 1 else 1
+
+        def make_undo():
+            game.undo_move(x, y, z)
+            game.make_move(x, y, z, player)
+
+    return {
+        'make_undo': make_undo,
+        'available_moves': game.get_available_moves,
+        'check_winner': lambda: game.check_winner(0),
+        'check_win_at': lambda: game.check_win_at(x, y, z, 0),
+        'winning_lines': game.generate_winning_lines,
+        'heuristic': lambda: ai.heuristic(0),
+        'static_heuristic': lambda: ai.static_heuristic(0),
+    }
+
+
+def calibrate(fn, min_time):
+    """Loop count for one sample of `fn` lasting at least `min_time` seconds"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            return loops
+        loops *= 2
+
+
+def measure(fn, samples=7, min_time=0.05):
+    loops = calibrate(fn, min_time)
+    rates = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        rates.append(loops / (time.perf_counter() - start))
+    mean = statistics.fmean(rates)
+    half = 0.0
+    if samples > 1:
+        half = t_quantile(samples - 1) * statistics.stdev(rates) / math.sqrt(samples)
+    return {'ops_per_sec': mean, 'ci95': half, 'loops': loops, 'samples': samples}
+
+
+def run(sizes, names=None, samples=7, min_time=0.05, verbose=True):
+    results = {}
+    for board_size in sizes:
+        for kind in BOARDS:
+            game = make_board(board_size, kind)
+            # only the heuristic tables are needed, not the search helpers
+            ai = AIPlayer(game, tt_size_mb=0, symmetry=False, threat_search=False, endgame_empties=0)
+            for name, fn in primitives(game, ai).items():
+                if names and name not in names:
+                    continue
+                res = measure(fn, samples, min_time)
+                results.setdefault(str(board_size), {}).setdefault(kind, {})[name] = res
+                if verbose:
+                    rel = 100 * res['ci95'] / res['ops_per_sec']
+                    print(f"N={board_size} {kind:5s} {name:17s} {res['ops_per_sec']:14.0f} ops/s "
+                          f"+- {rel:4.1f}%", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CubiXpert primitive micro-benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3, 4, 5, 6, 7, 8])
+    parser.add_argument('--primitive', action='append', help='only this primitive')
+    parser.add_argument('--samples', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per sample')
+    parser.add_argument('--out', help='write the results as JSON')
+    parser.add_argument('--profile', help='write a cProfile dump of the whole run')
+    args = parser.parse_args(argv)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    results = run(args.sizes, args.primitive, args.samples, args.min_time)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(15)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
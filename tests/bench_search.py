@@ -0,0 +1,276 @@
+"""End-to-end search benchmark over the positions in bench_positions.json.
+
+Every position is searched with a fresh AIPlayer through AIPlayer.search
+under a time limit, so the deepening used in play runs: aspiration
+windows, PV seeding and the time control. The default limit is never
+reached and every run deepens to the position's depth; --time-ms sets
+a real one. Runs are timed with perf_counter over several repeats after
+warm-up runs. Reported per position: nodes, nodes/sec, time to reach
+each depth and, for forced wins, the time to solution (the depth from
+which the chosen move stays one of the known winning moves).
+
+    python -m tests.bench_search                          # print a table
+    python -m tests.bench_search --out bench.json         # save the results
+    python -m tests.bench_search --baseline bench.json    # flag regressions
+    python -m tests.bench_search --time-ms 200            # as deep as 200 ms get
+
+With --baseline the exit status is 1 when any position got slower or
+searched more nodes than the threshold allows, or lost its solution.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from models.cubic_game import CubicGame
+from models.ai_logic import AIPlayer
+
+POSITIONS_PATH = os.path.join(os.path.dirname(__file__), 'bench_positions.json')
+
+# the full-width search is what gets measured; the threat-space and
+# endgame solvers would answer some positions before it runs
+DEFAULT_OPTIONS = {'threat_search': False, 'endgame_empties': 0, 'book_path': None}
+
+# a time limit no benchmark position comes near, so the time control
+# always starts the next depth and runs stay comparable
+UNLIMITED_MS = 10 * 60 * 1000
+
+
+def load_positions(path=POSITIONS_PATH):
+    with open(path) as f:
+        return json.load(f)['positions']
+
+
+def make_game(board):
+    """CubicGame from the layer strings of a benchmark position"""
+    game = CubicGame(len(board))
+    for z, layer in enumerate(board):
+        for y, row in enumerate(layer.split()):
+            for x, cell in enumerate(row):
+                if cell == 'O':
+                    game.make_move(x, y, z, 0)
+                elif cell == 'X':
+                    game.make_move(x, y, z, 1)
+    return game
+
+
+def deepen(position, options, max_depth=None, time_limit_ms=UNLIMITED_MS):
+    """One timed AIPlayer.search on a fresh AIPlayer, deepening as in play.
+
+    Returns per completed depth the time since the search started, the
+    cumulative nodes and the chosen move, and the SearchStats."""
+    ai = AIPlayer(make_game(position['board']), **options)
+    try:
+        _, stats = ai.search(time_limit_ms=time_limit_ms, max_depth=max_depth or position['depth'])
+    finally:
+        ai.close()
+    times = [elapsed for _, _, _, _, elapsed in stats.iterations]
+    nodes = [n for _, _, _, n, _ in stats.iterations]
+    moves = [list(mv) if mv is not None else None for _, mv, _, _, _ in stats.iterations]
+    return times, nodes, moves, stats
+
+
+def solution_depth(moves, best_moves):
+    """First depth from which every iteration picked a winning move"""
+    best = {tuple(mv) for mv in best_moves}
+    found = None
+    for d, mv in enumerate(moves, 1):
+        if mv is not None and tuple(mv) in best:
+            if found is None:
+                found = d
+        else:
+            found = None
+    return found
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def bench_position(position, options, repeat=5, warmup=1, max_depth=None,
+                   time_limit_ms=UNLIMITED_MS):
+    for _ in range(warmup):
+        deepen(position, options, max_depth, time_limit_ms)
+    runs = [deepen(position, options, max_depth, time_limit_ms) for _ in range(repeat)]
+    # node counts and moves of a serial search do not vary between runs; a
+    # real time limit may stop some runs a depth short, so only the depths
+    # every run completed are compared
+    reached = min(len(run[2]) for run in runs)
+    _, nodes, moves, stats = runs[-1]
+    nodes, moves = nodes[:reached], moves[:reached]
+    per_depth = [statistics.median(run[0][d] for run in runs) for d in range(reached)]
+    elapsed = summarize([run[3].elapsed for run in runs])
+    result = {
+        'category': position['category'],
+        'depth': len(moves),
+        'nodes': stats.nodes,
+        'time': elapsed,
+        'nps': stats.nodes / elapsed['median'] if elapsed['median'] else 0.0,
+        'time_to_depth': per_depth,
+        'nodes_to_depth': nodes,
+        'moves': moves,
+        'leaf_evals': stats.leaf_evals,
+        'first_move_cutoff_rate': stats.first_move_cutoff_rate,
+        'tt_hit_rate': stats.tt_hit_rate,
+    }
+    if 'best_moves' in position:
+        d = solution_depth(moves, position['best_moves'])
+        result['solution'] = {
+            'solved': d is not None,
+            'depth': d,
+            'time': per_depth[d - 1] if d is not None else None,
+        }
+    return result
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(positions, options, repeat=5, warmup=1, max_depth=None, verbose=True,
+              time_limit_ms=UNLIMITED_MS):
+    results = {}
+    for position in positions:
+        results[position['name']] = res = bench_position(position, options, repeat, warmup,
+                                                         max_depth, time_limit_ms)
+        if verbose:
+            print(format_row(position['name'], res), flush=True)
+    total_nodes = sum(r['nodes'] for r in results.values())
+    total_time = sum(r['time']['median'] for r in results.values())
+    solved = [r['solution']['solved'] for r in results.values() if 'solution' in r]
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': options,
+            'repeat': repeat,
+            'warmup': warmup,
+            'time_limit_ms': time_limit_ms,
+        },
+        'summary': {
+            'nodes': total_nodes,
+            'time': total_time,
+            'nps': total_nodes / total_time if total_time else 0.0,
+            'solved': sum(solved),
+            'forced_wins': len(solved),
+        },
+        'positions': results,
+    }
+
+
+def format_row(name, res):
+    row = (f"{name:16s} {res['category']:11s} d{res['depth']}  {res['nodes']:9d} nodes  "
+           f"{res['time']['median'] * 1000:9.1f} ms  {res['nps']:9.0f} n/s")
+    sol = res.get('solution')
+    if sol is not None:
+        row += f"  solved at d{sol['depth']}" if sol['solved'] else '  UNSOLVED'
+    return row
+
+
+def compare(current, baseline, threshold=0.10):
+    """Lines describing changes against `baseline`, and whether any is a regression"""
+    lines = []
+    regressed = False
+    if current['meta']['options'] != baseline['meta']['options']:
+        lines.append(f"note: options differ from the baseline ({baseline['meta']['options']})")
+    if current['meta'].get('time_limit_ms') != baseline['meta'].get('time_limit_ms'):
+        lines.append(f"note: time limit differs from the baseline "
+                     f"({baseline['meta'].get('time_limit_ms')} ms)")
+    for name, cur in current['positions'].items():
+        base = baseline['positions'].get(name)
+        if base is None:
+            lines.append(f'{name}: not in the baseline')
+            continue
+        if cur['depth'] != base['depth']:
+            lines.append(f"{name}: searched to d{cur['depth']}, baseline d{base['depth']}; skipped")
+            continue
+        t_ratio = cur['time']['median'] / base['time']['median'] if base['time']['median'] else 1.0
+        n_ratio = cur['nodes'] / base['nodes'] if base['nodes'] else 1.0
+        flags = []
+        if t_ratio > 1 + threshold:
+            flags.append('slower')
+        if n_ratio > 1 + threshold:
+            flags.append('more nodes')
+        sol, base_sol = cur.get('solution'), base.get('solution')
+        if sol is not None and base_sol is not None and base_sol['solved']:
+            if not sol['solved']:
+                flags.append('solution lost')
+            elif sol['depth'] > base_sol['depth']:
+                flags.append('solved later')
+        if cur['moves'][-1] != base['moves'][-1]:
+            lines.append(f"{name}: move changed {base['moves'][-1]} -> {cur['moves'][-1]}")
+        regressed = regressed or bool(flags)
+        lines.append(f"{name:16s} time x{t_ratio:5.2f}  nodes x{n_ratio:5.2f}"
+                     + (f"  REGRESSION: {', '.join(flags)}" if flags else ''))
+    return lines, regressed
+
+
+def parse_option(text):
+    key, _, value = text.partition('=')
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return key, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CubiXpert search benchmark')
+    parser.add_argument('--positions', default=POSITIONS_PATH)
+    parser.add_argument('--category', action='append', help='only positions of this category')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per position')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per position')
+    parser.add_argument('--depth', type=int, help='override the depth of every position')
+    parser.add_argument('--time-ms', type=int, default=UNLIMITED_MS,
+                        help='time limit of every search; by default no position reaches it')
+    parser.add_argument('--option', action='append', default=[], metavar='KEY=VALUE',
+                        help='AIPlayer keyword argument, e.g. --option move_ordering=False')
+    parser.add_argument('--out', help='write the results as JSON')
+    parser.add_argument('--baseline', help='compare against saved results')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown counted as a regression')
+    args = parser.parse_args(argv)
+
+    positions = load_positions(args.positions)
+    if args.category:
+        positions = [p for p in positions if p['category'] in args.category]
+    options = dict(DEFAULT_OPTIONS)
+    options.update(parse_option(o) for o in args.option)
+
+    results = run_suite(positions, options, args.repeat, args.warmup, args.depth,
+                        time_limit_ms=args.time_ms)
+    s = results['summary']
+    print(f"total {s['nodes']} nodes  {s['time']:.2f} s  {s['nps']:.0f} n/s  "
+          f"solved {s['solved']}/{s['forced_wins']}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressed = compare(results, baseline, args.threshold)
+        print('\n'.join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
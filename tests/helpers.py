@@ -0,0 +1,38 @@
+import random
+
+from models.cubic_game import CubicGame
+
+
+def winning_cells(game, player):
+    """Empty cells that complete a line for `player`, found by trying each"""
+    cells = []
+    for mv in game.get_available_moves():
+        game.make_move(*mv, player)
+        if game.check_win_at(*mv, player)[0]:
+            cells.append(mv)
+        game.undo_move(*mv)
+    return cells
+
+
+def random_positions(count, plies, seed, board_size=4, quiet=False):
+    """(game, player to move) after `plies` random moves nobody won with.
+
+    Random play leaves a win in one almost every time; with `quiet` threats
+    are answered as they appear and only positions with no line one move
+    from completion are kept."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = CubicGame(board_size)
+        player = 0
+        for _ in range(plies):
+            forced = quiet and (winning_cells(game, player) or winning_cells(game, 1 - player))
+            mv = forced[0] if forced else rng.choice(game.get_available_moves())
+            game.make_move(*mv, player)
+            if game.check_win_at(*mv, player)[0]:
+                break
+            player = 1 - player
+        else:
+            if not quiet or not (winning_cells(game, 0) or winning_cells(game, 1)):
+                positions.append((game, player))
+    return positions
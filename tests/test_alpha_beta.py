@@ -9,6 +9,7 @@ class AlphaBetaTester:
         self.depth = depth
         self.total_wins = 0
         self.total_time = 0
+        self.total_moves = 0
         self.move_times = []
     
     def heuristic(self, game, player):
@@ -24,11 +25,12 @@ class AlphaBetaTester:
         return score
 
     def get_move(self, game):
-        start_time = time.time()
+        start_time = time.perf_counter()
         move, _ = self._alphabeta(game, self.depth, -math.inf, math.inf, True)
-        elapsed = time.time() - start_time
+        elapsed = time.perf_counter() - start_time
         self.move_times.append(elapsed)
         self.total_time += elapsed
+        self.total_moves += 1
         return move
 
     def _alphabeta(self, game, depth, alpha, beta, maximizing):
@@ -117,7 +119,7 @@ def run_alpha_beta_tests(num_games=10):
         f.write(f"\n\nFinal Results ({num_games} games):\n")
         f.write(f"AlphaBeta Wins: {tester.total_wins}\n")
         f.write(f"Win Rate: {tester.total_wins/num_games:.1%}\n")
-        f.write(f"Average Move Time: {tester.total_time/sum(len(t.move_times) for t in [tester]):.4f}s")
+        f.write(f"Average Move Time: {tester.total_time/tester.total_moves:.4f}s")
 
 if __name__ == "__main__":
     run_alpha_beta_tests()
\ No newline at end of file
@@ -8,6 +8,7 @@ class MinimaxTester:
         self.depth = depth
         self.total_wins = 0
         self.total_time = 0
+        self.total_moves = 0
         self.move_times = []
     
     def heuristic(self, game, player):
@@ -23,11 +24,12 @@ class MinimaxTester:
         return score
 
     def get_move(self, game):
-        start_time = time.time()
+        start_time = time.perf_counter()
         move, _ = self._minimax(game, self.depth, True)
-        elapsed = time.time() - start_time
+        elapsed = time.perf_counter() - start_time
         self.move_times.append(elapsed)
         self.total_time += elapsed
+        self.total_moves += 1
         return move
 
     def _minimax(self, game, depth, maximizing):
@@ -110,7 +112,7 @@ def run_minimax_tests(num_games=10):
         f.write(f"\n\nFinal Results ({num_games} games):\n")
         f.write(f"Minimax Wins: {tester.total_wins}\n")
         f.write(f"Win Rate: {tester.total_wins/num_games:.1%}\n")
-        f.write(f"Average Move Time: {tester.total_time/sum(len(t.move_times) for t in [tester]):.4f}s")
+        f.write(f"Average Move Time: {tester.total_time/tester.total_moves:.4f}s")
 
 if __name__ == "__main__":
     run_minimax_tests()
\ No newline at end of file
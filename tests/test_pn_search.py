@@ -0,0 +1,107 @@
+import unittest
+
+from models.cubic_game import CubicGame
+from models.pn_search import ProofNumberSearch, WIN, LOSS, DRAW
+from tests.helpers import random_positions
+
+OUTCOMES = {1: WIN, 0: DRAW, -1: LOSS}
+
+
+def exhaustive(game, player, memo):
+    """Game value for `player` to move by full minimax: 1 win, 0 draw, -1 loss"""
+    key = (game.bitboards[0], game.bitboards[1], player)
+    if key in memo:
+        return memo[key]
+    best = -1 if game.move_count < game.NUM_CELLS else 0
+    for mv in game.get_available_moves():
+        game.make_move(*mv, player)
+        if game.check_win_at(*mv, player)[0]:
+            value = 1
+        else:
+            value = -exhaustive(game, 1 - player, memo)
+        game.undo_move(*mv)
+        best = max(best, value)
+        if best == 1:
+            break
+    memo[key] = best
+    return best
+
+
+def value_after(game, player, move, memo):
+    """Value for `player` of playing `move`"""
+    game.make_move(*move, player)
+    try:
+        if game.check_win_at(*move, player)[0]:
+            return 1
+        return -exhaustive(game, 1 - player, memo)
+    finally:
+        game.undo_move(*move)
+
+
+class ProofNumberSearchTest(unittest.TestCase):
+
+    def check_endgames(self, board_size, empties, count, seed):
+        seen = set()
+        plies = board_size ** 3 - empties
+        for game, player in random_positions(count, plies, seed, board_size, quiet=True):
+            memo = {}
+            expected = OUTCOMES[exhaustive(game, player, memo)]
+            solution = ProofNumberSearch(game.copy(), max_nodes=10 ** 6).solve(player)
+            self.assertIsNotNone(solution)
+            self.assertEqual(solution.outcome, expected)
+            seen.add(expected)
+            # the move to play, and every move listed, keeps the outcome
+            self.assertIn(solution.move, solution.moves)
+            for mv in solution.moves:
+                self.assertEqual(OUTCOMES[value_after(game, player, mv, memo)], expected)
+            if expected == WIN:
+                self.assertEqual(solution.distance % 2, 1)
+            elif expected == LOSS:
+                self.assertEqual(solution.distance % 2, 0)
+        return seen
+
+    def test_small_board_endgames(self):
+        # the side to move wins every quiet 3x3x3 position
+        for empties in (14, 16):
+            self.assertEqual(self.check_endgames(3, empties, 6, seed=empties), {WIN})
+
+    def test_endgames(self):
+        seen = self.check_endgames(4, 10, 10, seed=7)
+        seen |= self.check_endgames(4, 8, 10, seed=8)
+        self.assertEqual(seen, {WIN, DRAW})
+
+    def test_quickest_win(self):
+        # O can complete the row at (3,0,0) at once; the solver must not
+        # pick a slower win
+        game = CubicGame()
+        for mv in ((0, 0, 0), (1, 0, 0), (2, 0, 0)):
+            game.make_move(*mv, 0)
+        for mv in ((0, 3, 3), (1, 2, 3), (3, 3, 0)):
+            game.make_move(*mv, 1)
+        solution = ProofNumberSearch(game).solve(0)
+        self.assertEqual((solution.outcome, solution.distance, solution.move), (WIN, 1, (3, 0, 0)))
+
+    def test_lost_position(self):
+        # X has two lines one move from completion; O blocks one and loses
+        game = CubicGame()
+        for mv in ((0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0), (0, 2, 0)):
+            game.make_move(*mv, 1)
+        for mv in ((1, 1, 3), (2, 2, 3), (3, 3, 2), (1, 2, 2)):
+            game.make_move(*mv, 0)
+        solution = ProofNumberSearch(game).solve(0)
+        self.assertEqual((solution.outcome, solution.distance), (LOSS, 2))
+        self.assertEqual(sorted(solution.moves), [(0, 3, 0), (3, 0, 0)])
+
+    def test_gives_up_within_its_budget(self):
+        game = CubicGame()
+        pn = ProofNumberSearch(game, max_nodes=200)
+        self.assertIsNone(pn.solve(0))
+        self.assertLessEqual(pn.nodes, 201)
+        self.assertEqual(game.move_count, 0)
+        pn = ProofNumberSearch(game)
+        pn.stopped = True
+        self.assertIsNone(pn.solve(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import time
+import unittest
+
+from models.cubic_game import CubicGame
+from models.threat_search import ThreatSpaceSearch, FORCED_LOSS, TIME_CHECK_INTERVAL
+from tests.helpers import random_positions, winning_cells
+
+
+def forcing_failure(game, attacker, sequence):
+    """Why `sequence` is not a forced win for `attacker`, or None if it is.
+
+    Checked independently of the search: after every attacker move the
+    defender must have no winning cell of its own, a single threat must be
+    answered by the listed block, and the last attacker move must win. The
+    game is left as it was."""
+    played = []
+    try:
+        return _replay(game, attacker, sequence, played)
+    finally:
+        for mv in reversed(played):
+            game.undo_move(*mv)
+
+
+def _replay(game, attacker, sequence, played):
+    defender = 1 - attacker
+    for i in range(0, len(sequence), 2):
+        mv = sequence[i]
+        if mv not in game.get_available_moves():
+            return f'attacker move {i} {mv} is not legal'
+        game.make_move(*mv, attacker)
+        played.append(mv)
+        if game.check_win_at(*mv, attacker)[0]:
+            return None if i == len(sequence) - 1 else f'won early at move {i}'
+        if i + 1 >= len(sequence):
+            return 'the sequence ends without a win'
+        if winning_cells(game, defender):
+            return f'the defender can win after move {i}'
+        threats = winning_cells(game, attacker)
+        if not threats:
+            return f'move {i} {mv} makes no threat'
+        if len(threats) == 1 and sequence[i + 1] != threats[0]:
+            return f'move {i + 1} is not the forced block {threats[0]}'
+        if sequence[i + 1] not in threats:
+            return f'move {i + 1} does not block a threat'
+        game.make_move(*sequence[i + 1], defender)
+        played.append(sequence[i + 1])
+        if game.check_win_at(*sequence[i + 1], defender)[0]:
+            return f'the block at move {i + 1} wins for the defender'
+    return 'the sequence ends without a win'
+
+
+class ThreatSearchTest(unittest.TestCase):
+
+    def test_wins_are_forcing(self):
+        wins = 0
+        for plies in (8, 12, 16, 20):
+            for game, player in random_positions(40, plies, seed=plies):
+                seq = ThreatSpaceSearch(game).find_win(player)
+                if seq is None:
+                    continue
+                wins += 1
+                self.assertIsNone(forcing_failure(game, player, seq), seq)
+        # the positions must actually exercise the solver
+        self.assertGreater(wins, 20)
+
+    def test_search_leaves_the_game_unchanged(self):
+        for game, player in random_positions(10, 12, seed=1):
+            before = (game.bitboards[0], game.bitboards[1], game.hash, list(game.line_counts[0]))
+            ThreatSpaceSearch(game).analyse(player)
+            self.assertEqual(before, (game.bitboards[0], game.bitboards[1], game.hash,
+                                      list(game.line_counts[0])))
+
+    def test_gives_up_in_time(self):
+        aborted = 0
+        for game, player in random_positions(40, 16, seed=5):
+            before = (game.bitboards[0], game.bitboards[1], game.hash, list(game.line_counts[0]))
+            search = ThreatSpaceSearch(game)
+            # out of time at the first clock read, deep inside the search
+            search.out_of_time = lambda: search.nodes >= TIME_CHECK_INTERVAL
+            seq = search.find_win(player)
+            if search.nodes == TIME_CHECK_INTERVAL:
+                aborted += 1
+                self.assertIsNone(seq)
+            self.assertEqual(before, (game.bitboards[0], game.bitboards[1], game.hash,
+                                      list(game.line_counts[0])))
+        self.assertGreater(aborted, 0)
+        game, player = random_positions(1, 16, seed=5)[0]
+        self.assertIsNone(ThreatSpaceSearch(game).analyse(player, deadline=time.perf_counter()))
+        search = ThreatSpaceSearch(game)
+        search.stopped = True
+        self.assertIsNone(search.analyse(player))
+
+    def test_double_threat(self):
+        # O holds two cells of the row and two of the column through the
+        # empty corner (0,0,0): playing it makes two threats at once
+        game = CubicGame()
+        for mv in ((1, 0, 0), (2, 0, 0), (0, 1, 0), (0, 2, 0)):
+            game.make_move(*mv, 0)
+        for mv in ((1, 1, 3), (2, 2, 3), (3, 3, 2), (1, 2, 2)):
+            game.make_move(*mv, 1)
+        seq = ThreatSpaceSearch(game).find_win(0)
+        self.assertEqual(len(seq), 3)
+        self.assertEqual(seq[0], (0, 0, 0))
+        self.assertIsNone(forcing_failure(game, 0, seq))
+
+    def test_single_threat_is_no_win(self):
+        # one threat can always be blocked, and nothing follows from it
+        game = CubicGame()
+        for mv in ((0, 0, 0), (1, 0, 0)):
+            game.make_move(*mv, 0)
+        game.make_move(3, 3, 3, 1)
+        game.make_move(2, 3, 3, 1)
+        self.assertIsNone(ThreatSpaceSearch(game).find_win(0))
+
+    def test_no_fork_while_the_opponent_threatens(self):
+        # the same fork, but X has three in a row: O has to block at
+        # (3,3,3), which makes no threat, so there is no forced win
+        game = CubicGame()
+        for mv in ((1, 0, 0), (2, 0, 0), (0, 1, 0), (0, 2, 0)):
+            game.make_move(*mv, 0)
+        for mv in ((0, 3, 3), (1, 3, 3), (2, 3, 3), (1, 2, 2)):
+            game.make_move(*mv, 1)
+        self.assertEqual(winning_cells(game, 1), [(3, 3, 3)])
+        self.assertIsNone(ThreatSpaceSearch(game).find_win(0))
+
+    def test_forced_loss_is_the_opponents_forced_win(self):
+        losses = 0
+        for plies in (12, 16, 20):
+            for game, player in random_positions(40, plies, seed=100 + plies):
+                result = ThreatSpaceSearch(game).analyse(player)
+                if result is None or result.outcome != FORCED_LOSS:
+                    continue
+                losses += 1
+                first, rest = result.sequence[0], result.sequence[1:]
+                game.make_move(*first, player)
+                self.assertIsNone(forcing_failure(game, 1 - player, rest), result.sequence)
+                game.undo_move(*first)
+        self.assertGreater(losses, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""Headless match between two AIPlayer configurations.
+
+Games are played in parallel over a process pool. Every opening, a few
+random plies or none, is played twice with the engines swapping who
+moves first. The score is reported as an Elo difference with a 95%
+interval; with --sprt the match stops as soon as a sequential
+probability ratio test accepts H0 (elo <= elo0) or H1 (elo >= elo1).
+
+    python -m tests.tournament --engine depth=3 --engine depth=2 --games 200
+    python -m tests.tournament --engine depth=2 --engine depth=2,move_ordering=False \\
+        --time-ms 200 --sprt 0 20
+
+Engines are given as comma-separated AIPlayer keyword arguments. Each
+engine plays as player 0 on its own copy of the board, the opponent's
+stones being player 1 there, since AIPlayer always searches for player 0.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from models.cubic_game import CubicGame
+from models.ai_logic import AIPlayer
+from tests.bench_search import parse_option
+
+WIN, DRAW, LOSS = 1.0, 0.5, 0.0
+# the variance estimate behind the SPRT is too noisy before this many games
+SPRT_MIN_GAMES = 20
+
+
+def parse_engine(text):
+    """AIPlayer keyword arguments from 'depth=3,move_ordering=False'"""
+    options = {'book_path': None}
+    for part in filter(None, text.split(',')):
+        key, value = parse_option(part)
+        options[key] = value
+    return options
+
+
+def play_game(options_a, options_b, opening, a_first, board_size=4, time_ms=None):
+    """Play one game; returns (score of engine A, number of moves)"""
+    games = [CubicGame(board_size), CubicGame(board_size)]
+    players = [AIPlayer(games[0], **options_a), AIPlayer(games[1], **options_b)]
+    side = 0 if a_first else 1
+    moves = 0
+    try:
+        while True:
+            if moves < len(opening):
+                mv = opening[moves]
+            else:
+                mv = players[side].get_best_move(time_limit_ms=time_ms)
+            games[side].make_move(*mv, 0)
+            games[1 - side].make_move(*mv, 1)
+            moves += 1
+            if games[side].check_win_at(*mv, 0)[0]:
+                return (WIN if side == 0 else LOSS), moves
+            if moves == games[0].NUM_CELLS:
+                return DRAW, moves
+            side = 1 - side
+    finally:
+        for player in players:
+            player.close()
+
+
+def random_openings(count, plies, board_size=4, seed=0):
+    rng = random.Random(seed)
+    cells = CubicGame(board_size).cell_coords
+    return [rng.sample(cells, plies) for _ in range(count)]
+
+
+def score_stats(wins, draws, losses):
+    """Mean score per game and its per-game variance"""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.5, 0.0
+    s = (wins + 0.5 * draws) / n
+    var = (wins * (1 - s) ** 2 + draws * (0.5 - s) ** 2 + losses * s ** 2) / n
+    return s, var
+
+
+def elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def expected_score(elo_diff):
+    return 1 / (1 + 10 ** (-elo_diff / 400))
+
+
+def elo_interval(wins, draws, losses, z=1.96):
+    """Elo difference and its 95% interval"""
+    n = wins + draws + losses
+    s, var = score_stats(wins, draws, losses)
+    margin = z * math.sqrt(var / n) if n else 0.0
+    return elo(s), elo(s - margin), elo(s + margin)
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 against H0, normal approximation"""
+    n = wins + draws + losses
+    s, var = score_stats(wins, draws, losses)
+    if var == 0:
+        return 0.0
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * s - s0 - s1) / (2 * var)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def format_elo(value):
+    return f'{value:+.0f}' if math.isfinite(value) else ('+inf' if value > 0 else '-inf')
+
+
+def run_match(options_a, options_b, games=100, opening_plies=2, board_size=4, time_ms=None,
+              workers=None, sprt=None, alpha=0.05, beta=0.05, seed=0, verbose=True):
+    workers = workers or multiprocessing.cpu_count()
+    openings = random_openings((games + 1) // 2, opening_plies, board_size, seed)
+    jobs = [(opening, a_first) for opening in openings for a_first in (True, False)][:games]
+    wins = draws = losses = 0
+    llr, verdict = 0.0, None
+    lower, upper = sprt_bounds(alpha, beta)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(play_game, options_a, options_b, opening, a_first, board_size, time_ms)
+                   for opening, a_first in jobs}
+        while pending and verdict is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                score, _ = fut.result()
+                if score == WIN:
+                    wins += 1
+                elif score == DRAW:
+                    draws += 1
+                else:
+                    losses += 1
+            if sprt is not None and wins + draws + losses >= SPRT_MIN_GAMES:
+                llr = sprt_llr(wins, draws, losses, *sprt)
+                if llr >= upper:
+                    verdict = 'H1'
+                elif llr <= lower:
+                    verdict = 'H0'
+            if verbose:
+                e, lo, hi = elo_interval(wins, draws, losses)
+                line = (f'{wins + draws + losses:5d} games  +{wins} ={draws} -{losses}  '
+                        f'elo {format_elo(e)} [{format_elo(lo)}, {format_elo(hi)}]')
+                if sprt is not None:
+                    line += f'  llr {llr:+.2f} ({lower:.2f}, {upper:.2f})'
+                print(line, flush=True)
+        for fut in pending:
+            fut.cancel()
+    e, lo, hi = elo_interval(wins, draws, losses)
+    return {
+        'engine_a': options_a,
+        'engine_b': options_b,
+        'games': wins + draws + losses,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'elo': e,
+        'elo_low': lo,
+        'elo_high': hi,
+        'sprt': None if sprt is None else {
+            'elo0': sprt[0], 'elo1': sprt[1], 'alpha': alpha, 'beta': beta,
+            'llr': llr, 'verdict': verdict,
+        },
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CubiXpert engine match')
+    parser.add_argument('--engine', action='append', required=True, metavar='KEY=VALUE,...',
+                        help='AIPlayer options; give exactly two engines, A first')
+    parser.add_argument('--games', type=int, default=100, help='maximum number of games')
+    parser.add_argument('--opening-plies', type=int, default=2, help='random plies before the engines play')
+    parser.add_argument('--book', help='opening book both engines use')
+    parser.add_argument('--time-ms', type=int, help='time per move instead of fixed depth')
+    parser.add_argument('--size', type=int, default=4, help='board size')
+    parser.add_argument('--workers', type=int, help='processes, default one per core')
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'),
+                        help='stop early once H0: elo <= ELO0 or H1: elo >= ELO1 is accepted')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random openings')
+    parser.add_argument('--out', help='write the result as JSON')
+    args = parser.parse_args(argv)
+    if len(args.engine) != 2:
+        parser.error('give exactly two --engine options')
+
+    engines = [parse_engine(text) for text in args.engine]
+    if args.book:
+        for options in engines:
+            options['book_path'] = args.book
+    result = run_match(engines[0], engines[1], args.games, args.opening_plies, args.size,
+                       args.time_ms, args.workers, args.sprt, args.alpha, args.beta, args.seed)
+    print(f"A vs B: +{result['wins']} ={result['draws']} -{result['losses']}  "
+          f"elo {format_elo(result['elo'])} [{format_elo(result['elo_low'])}, "
+          f"{format_elo(result['elo_high'])}]  {result['seconds']:.1f}s")
+    if result['sprt'] is not None:
+        print(f"SPRT: {result['sprt']['verdict'] or 'no decision'} (llr {result['sprt']['llr']:+.2f})")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,27 @@
 import pygame
 import random
 import os
+import threading
+
+
+def load_font(size):
+    # SysFont never matches a file path and falls back to pygame's default
+    # font in bold; load that directly and skip the system font scan
+    font = pygame.font.Font(None, size)
+    font.set_bold(True)
+    return font
+
 
 class GameGUI:
+    """The game window, created once and reused for every game via reset()"""
+
     def __init__(self, game):
-        pygame.init()
-        pygame.mixer.init()
-        try:
-            music_path = os.getcwd() + '/views/gui/assets/sounds/MarwanMoussa-ElBoslaDa3et.mp3'
-            pygame.mixer.music.load(music_path)
-            pygame.mixer.music.set_volume(0.5)  # softer
-            pygame.mixer.music.play(loops= -1,start= 35)  # loop forever
-        except pygame.error as e:
-            print(f"Failed to load music: {e}")
-            print(os.getcwd())
+        if not pygame.get_init():
+            pygame.init()
+        # the music starts on a background thread, the menu does not wait for it
+        self.music_lock = threading.Lock()
+        self.music_paused = False
+        threading.Thread(target=self.start_music, daemon=True).start()
         self.game = game
         self.CELL_SIZE = 40
         self.LAYER_SPACING = 8
@@ -22,13 +30,12 @@ class GameGUI:
         self.HEIGHT = 800
         self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
         pygame.display.set_caption('CubiXpert: Galaxy Edition 3D Tic-Tac-Toe')
-        font_path = os.path.join(os.getcwd(), 'views/gui/assets/fonts/Consolas.ttf')
-        self.font = pygame.font.SysFont(font_path, 32, bold=True)
-        self.end_title_font = pygame.font.SysFont(font_path, 24, bold=True)
-        self.end_score_font = pygame.font.SysFont(font_path, 22, bold=True)
-        self.end_button_font = pygame.font.SysFont(font_path, 20, bold=True)
-        self.start_title_font = pygame.font.SysFont(font_path, 80, bold=True)
-        self.credits_font = pygame.font.SysFont(font_path, 30, bold=True)
+        self.font = load_font(32)
+        self.end_title_font = load_font(24)
+        self.end_score_font = load_font(22)
+        self.end_button_font = load_font(20)
+        self.start_title_font = load_font(80)
+        self.credits_font = load_font(30)
         self.star_positions = [
             (random.randint(0, self.WIDTH), random.randint(0, self.HEIGHT))
             for _ in range(200)
@@ -41,53 +48,79 @@ class GameGUI:
             'o_color':       (255, 0, 255),
             'neon_green':    (0, 255, 180),
             'win_line_color':(255, 255, 100),
+            'hover_color':   (40, 40, 110),
             'button_bg':     (50, 0, 80, 180),
             'text_color':    (220, 220, 255),
             'white':         (255, 255, 255),
         }
+        # static pieces of every frame, drawn once
+        self.starfield = pygame.Surface((self.WIDTH, self.HEIGHT)).convert()
+        self.starfield.fill(self.colors['dark_bg'])
+        self.draw_starfield(self.starfield)
+        self.glyphs = [
+            self.font.render('O', True, self.colors['o_color']),
+            self.font.render('X', True, self.colors['x_color']),
+        ]
+        self.layout_size = None
+        # strip below the board holding the 'AI is thinking' caption
+        self.indicator_rect = pygame.Rect(0, self.HEIGHT - 60, self.WIDTH, 40)
 
-    def draw_starfield(self):
-        for pos in self.star_positions:
-            pygame.draw.circle(self.screen, self.colors['star_color'], pos, 1)
+    def reset(self, game):
+        """Show `game` from now on; the layout is rebuilt only for a new board size.
 
-    def get_grid_position(self, pos):
-        mx, my = pos
-        N = self.game.BOARD_SIZE
-        W = self.WIDTH
-        H = self.CELL_SIZE * N
-        S = self.LAYER_SPACING
-        top_w = W * 0.6
-        bot_w = W * 0.8
-        # check each layer trapezoid
-        for z in range(N):
-            top_y = 50 + z * (H + S)
-            bot_y = top_y + H
-            if my < top_y or my > bot_y:
-                continue
-            fy = (my - top_y) / H
-            left_xt = (W - top_w) / 2
-            left_xb = (W - bot_w) / 2
-            left_x  = left_xt * (1 - fy) + left_xb * fy
-            width   = top_w * (1 - fy) + bot_w * fy
-            if mx < left_x or mx > left_x + width:
-                return None
-            y = int(fy * N)
-            fx = (mx - left_x) / width
-            x = int(fx * N)
-            return (x, y, z)
-        return None
+        The music paused by the start menu plays again for every game."""
+        self.game = game
+        self.resume_music()
+        return self
 
-    def draw_board(self, last_move=None):
-        # clear & stars
-        self.screen.fill(self.colors['dark_bg'])
-        self.draw_starfield()
+    def start_music(self):
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            music_path = os.getcwd() + '/views/gui/assets/sounds/MarwanMoussa-ElBoslaDa3et.mp3'
+            pygame.mixer.music.load(music_path)
+            pygame.mixer.music.set_volume(0.5)  # softer
+            with self.music_lock:
+                pygame.mixer.music.play(loops= -1,start= 35)  # loop forever
+                if self.music_paused:
+                    pygame.mixer.music.pause()
+        except pygame.error as e:
+            print(f"Failed to load music: {e}")
+            print(os.getcwd())
+
+    def pause_music(self):
+        with self.music_lock:
+            self.music_paused = True
+            if pygame.mixer.get_init():
+                pygame.mixer.music.pause()
+
+    def resume_music(self):
+        with self.music_lock:
+            self.music_paused = False
+            if pygame.mixer.get_init():
+                pygame.mixer.music.unpause()
+
+    def draw_starfield(self, surface=None):
+        surface = surface or self.screen
+        for pos in self.star_positions:
+            pygame.draw.circle(surface, self.colors['star_color'], pos, 1)
 
+    def build_layout(self):
+        """Precompute the board drawing for the current board size.
+
+        The starfield and the layer grids go onto one background surface and
+        every cell gets its corner polygon, centre and glyph position, so a
+        frame is one blit plus one glyph blit per stone.
+        """
         N = self.game.BOARD_SIZE
         W = self.WIDTH
         H = self.CELL_SIZE * N
         S = self.LAYER_SPACING
         top_w = W * 0.6
         bot_w = W * 0.8
+        self.background = self.starfield.copy()
+        self.cell_polygons = [None] * (N * N * N)
+        self.cell_centers = [None] * (N * N * N)
 
         for z in range(N):
             top_x = (W - top_w) / 2
@@ -102,13 +135,13 @@ class GameGUI:
                 (bot_x,         bot_y)
             ]
             # border
-            pygame.draw.polygon(self.screen, self.colors['grid_color'], pts, 2)
+            pygame.draw.polygon(self.background, self.colors['grid_color'], pts, 2)
             # vertical lines
             for i in range(1, N):
                 fx = i / N
                 start = (top_x + fx * top_w, top_y)
                 end   = (bot_x + fx * bot_w, bot_y)
-                pygame.draw.line(self.screen, self.colors['grid_color'], start, end, 1)
+                pygame.draw.line(self.background, self.colors['grid_color'], start, end, 1)
             # horizontal lines
             for i in range(1, N):
                 a = i / N
@@ -116,26 +149,9 @@ class GameGUI:
                          top_y * (1 - a) + bot_y * a)
                 right = ((top_x + top_w) * (1 - a) + (bot_x + bot_w) * a,
                          top_y * (1 - a) + bot_y * a)
-                pygame.draw.line(self.screen, self.colors['grid_color'], left, right, 1)
-
-        # overlay tokens
-        self.draw_moves(last_move)
-        pygame.display.flip()
-
-    def draw_moves(self, last_move=None):
-        N = self.game.BOARD_SIZE
-        W = self.WIDTH
-        H = self.CELL_SIZE * N
-        S = self.LAYER_SPACING
-        top_w = W * 0.6
-        bot_w = W * 0.8
+                pygame.draw.line(self.background, self.colors['grid_color'], left, right, 1)
 
-        for z in range(N):
-            top_x = (W - top_w) / 2
-            bot_x = (W - bot_w) / 2
-            top_y = 50 + z * (H + S)
-            bot_y = top_y + H
-            # precompute edges
+            # row edges
             left_edge = []
             right_edge = []
             for i in range(N + 1):
@@ -149,10 +165,7 @@ class GameGUI:
 
             for y in range(N):
                 for x in range(N):
-                    v = self.game.board[z][y][x]
-                    if v == -1:
-                        continue
-                    # compute cell corners
+                    # cell corners
                     b1 = x / N
                     b2 = (x + 1) / N
                     p1 = (left_edge[y][0] * (1 - b1) + right_edge[y][0] * b1,
@@ -163,65 +176,126 @@ class GameGUI:
                           left_edge[y+1][1] * (1 - b2) + right_edge[y+1][1] * b2)
                     p4 = (left_edge[y+1][0] * (1 - b1) + right_edge[y+1][0] * b1,
                           left_edge[y+1][1] * (1 - b1) + right_edge[y+1][1] * b1)
-                    # highlight last move: draw full cell border
-                    if last_move == (x, y, z):
-                        pygame.draw.polygon(
-                            self.screen,
-                            self.colors['neon_green'],
-                            [p1, p2, p3, p4],
-                            3
-                        )
-                    # draw symbol
-                    symbol = 'X' if v == 1 else 'O'
-                    color  = self.colors['x_color'] if v == 1 else self.colors['o_color']
-                    text   = self.font.render(symbol, True, color)
-                    self.screen.blit(text, text.get_rect(center=(((p1[0]+p3[0])/2), ((p1[1]+p3[1])/2))))
+                    idx = x + N * (y + N * z)
+                    self.cell_polygons[idx] = [p1, p2, p3, p4]
+                    # centre is the midpoint of the top-left and bottom-right corners
+                    self.cell_centers[idx] = ((p1[0] + p3[0]) / 2, (p1[1] + p3[1]) / 2)
 
-    def draw_win_line(self, line, color):
-        """
-        Draws the winning line connecting the centers of the first and last cells in the win `line`.
-        Uses the same trapezoidal cell scheme as draw_moves for accurate alignment.
-        """
+        self.glyph_positions = [
+            [glyph.get_rect(center=c).topleft for c in self.cell_centers]
+            for glyph in self.glyphs
+        ]
+        # screen area a cell's drawing can touch, highlight border included
+        self.cell_rects = []
+        for poly in self.cell_polygons:
+            xs = [p[0] for p in poly]
+            ys = [p[1] for p in poly]
+            rect = pygame.Rect(int(min(xs)), int(min(ys)), 0, 0)
+            rect.width = int(max(xs)) - rect.x + 1
+            rect.height = int(max(ys)) - rect.y + 1
+            self.cell_rects.append(rect.inflate(6, 6))
+        self.layout_size = N
+
+    def cell_rect(self, cell):
+        if self.layout_size != self.game.BOARD_SIZE:
+            self.build_layout()
+        return self.cell_rects[self.game.cell_index(*cell)]
+
+    def get_grid_position(self, pos):
+        mx, my = pos
         N = self.game.BOARD_SIZE
         W = self.WIDTH
         H = self.CELL_SIZE * N
         S = self.LAYER_SPACING
         top_w = W * 0.6
         bot_w = W * 0.8
-
-        def cell_center(x, y, z):
-            # layer-specific trapezoid
-            top_x = (W - top_w) / 2
-            bot_x = (W - bot_w) / 2
+        # check each layer trapezoid
+        for z in range(N):
             top_y = 50 + z * (H + S)
             bot_y = top_y + H
+            if my < top_y or my > bot_y:
+                continue
+            fy = (my - top_y) / H
+            left_xt = (W - top_w) / 2
+            left_xb = (W - bot_w) / 2
+            left_x  = left_xt * (1 - fy) + left_xb * fy
+            width   = top_w * (1 - fy) + bot_w * fy
+            if mx < left_x or mx > left_x + width:
+                return None
+            y = int(fy * N)
+            fx = (mx - left_x) / width
+            x = int(fx * N)
+            return (x, y, z)
+        return None
+
+    def draw_scene(self, last_move=None, thinking=False, hover=None):
+        """Draw the whole frame to the screen surface without showing it"""
+        if self.layout_size != self.game.BOARD_SIZE:
+            self.build_layout()
+        # stars & grid
+        self.screen.blit(self.background, (0, 0))
+        if hover is not None:
+            pygame.draw.polygon(self.screen, self.colors['hover_color'],
+                                self.cell_polygons[self.game.cell_index(*hover)])
+
+        # overlay tokens
+        self.draw_moves(last_move)
+        if thinking:
+            self.draw_thinking_indicator()
 
-            # compute edge points for row y and y+1
-            alpha_y  = y / N
-            alpha_y1 = (y + 1) / N
-            lx_y  = top_x * (1 - alpha_y)  + bot_x * alpha_y
-            ly_y  = top_y * (1 - alpha_y)  + bot_y * alpha_y
-            rx_y  = (top_x + top_w) * (1 - alpha_y)  + (bot_x + bot_w) * alpha_y
-            ry_y  = top_y * (1 - alpha_y)  + bot_y * alpha_y
-            lx_y1 = top_x * (1 - alpha_y1) + bot_x * alpha_y1
-            ly_y1 = top_y * (1 - alpha_y1) + bot_y * alpha_y1
-            rx_y1 = (top_x + top_w) * (1 - alpha_y1) + (bot_x + bot_w) * alpha_y1
-            ry_y1 = top_y * (1 - alpha_y1) + bot_y * alpha_y1
-
-            # interpolate horizontally within the row for column x
-            b1 = x / N
-            b2 = (x + 1) / N
-            p1 = (lx_y  * (1 - b1) + rx_y  * b1,
-                  ly_y  * (1 - b1) + ry_y  * b1)
-            p3 = (lx_y1 * (1 - b2) + rx_y1 * b2,
-                  ly_y1 * (1 - b2) + ry_y1 * b2)
-
-            # center is midpoint of top-left and bottom-right corners
-            return ((p1[0] + p3[0]) / 2, (p1[1] + p3[1]) / 2)
-
-        # compute start and end points
-        start = cell_center(*line[0])
-        end   = cell_center(*line[-1])
+    def draw_board(self, last_move=None, thinking=False, hover=None):
+        self.draw_scene(last_move, thinking, hover)
+        pygame.display.flip()
+
+    def redraw(self, rects, last_move=None, thinking=False, hover=None):
+        """Redraw and show only the given screen areas.
+
+        Each area is repainted with clipping on, so whatever overlaps it
+        (neighbouring glyphs, highlight borders) is restored exactly."""
+        rects = [r for r in rects if r is not None]
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.draw_scene(last_move, thinking, hover)
+        self.screen.set_clip(None)
+        pygame.display.update(rects)
+
+    def draw_thinking_indicator(self):
+        """Animated 'AI is thinking' caption below the board"""
+        dots = '.' * (pygame.time.get_ticks() // 400 % 4)
+        text = self.end_button_font.render(f'AI is thinking{dots}', True, self.colors['neon_green'])
+        # anchor the left edge so the caption does not jitter as dots appear
+        rect = text.get_rect(midleft=(self.WIDTH // 2 - 70, self.HEIGHT - 40))
+        self.screen.blit(text, rect)
+
+    def draw_moves(self, last_move=None):
+        game = self.game
+        # highlight last move: draw full cell border
+        if last_move is not None and game.board[last_move[2]][last_move[1]][last_move[0]] != -1:
+            pygame.draw.polygon(
+                self.screen,
+                self.colors['neon_green'],
+                self.cell_polygons[game.cell_index(*last_move)],
+                3
+            )
+        # draw symbols, straight from the bitboards
+        for player in (0, 1):
+            glyph = self.glyphs[player]
+            positions = self.glyph_positions[player]
+            mask = game.bitboards[player]
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                self.screen.blit(glyph, positions[low.bit_length() - 1])
+
+    def draw_win_line(self, line, color):
+        """
+        Draws the winning line connecting the centers of the first and last cells in the win `line`.
+        Uses the same trapezoidal cell centres as draw_moves for accurate alignment.
+        """
+        if self.layout_size != self.game.BOARD_SIZE:
+            self.build_layout()
+        start = self.cell_centers[self.game.cell_index(*line[0])]
+        end   = self.cell_centers[self.game.cell_index(*line[-1])]
         pygame.draw.line(self.screen, color, start, end, 4)
         pygame.display.flip()
 
@@ -243,14 +317,16 @@ class GameGUI:
         self.screen.blit(btn_text, btn_text_rect)
         pygame.display.flip()
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                if event.type == pygame.MOUSEBUTTONDOWN and btn.collidepoint(event.pos):
-                    return True
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
-                    return True
-            pygame.time.Clock().tick(30)
+            # nothing animates here, so sleep until the player acts
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.MOUSEBUTTONDOWN and btn.collidepoint(event.pos):
+                return True
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                return True
+            if event.type == pygame.VIDEOEXPOSE:
+                pygame.display.flip()
 
 
     def show_start_menu(self):
@@ -258,8 +334,7 @@ class GameGUI:
         Display a start menu with a 'Start Game' button.
         Returns True if the player clicks Start, False on quit.
         """
-        pygame.mixer.music.pause()
-        clock = pygame.time.Clock()
+        self.pause_music()
         btn_w, btn_h = 200, 60
         btn_rect = pygame.Rect(
             (self.WIDTH - btn_w) // 2,
@@ -268,38 +343,43 @@ class GameGUI:
         )
         title_surf = self.start_title_font.render('CubiXpert', True, self.colors['text_color'])
         title_rect = title_surf.get_rect(center=(self.WIDTH//2, self.HEIGHT//2 - 100))
+        txt_surf = self.font.render('Start Game', True, self.colors['white'])
+        txt_rect = txt_surf.get_rect(center=btn_rect.center)
+        # credits
+        lines = [
+            'By the Incredibles',
+            'Ahmed Elgalay',
+            'Abdelrahman Salah',
+            'Amr Fawzy',
+            'Ahmed Zidan'
+        ]
+
+        # Starting vertical position
+        start_y = self.HEIGHT // 2 + 100
+        credits = []
+        for i, line in enumerate(lines):
+            line_surf = self.credits_font.render(line, True, self.colors['text_color'])
+            line_rect = line_surf.get_rect(center=(self.WIDTH//2, start_y + i * 40))  # 40 pixels spacing between lines
+            credits.append((line_surf, line_rect))
 
+        redraw = True
         while True:
-            self.screen.fill(self.colors['dark_bg'])
-            self.draw_starfield()
-            # draw title
-            self.screen.blit(title_surf, title_rect)
-            # draw start button
-            pygame.draw.rect(self.screen, self.colors['grid_color'], btn_rect, border_radius=10)
-            txt_surf = self.font.render('Start Game', True, self.colors['white'])
-            txt_rect = txt_surf.get_rect(center=btn_rect.center)
-            self.screen.blit(txt_surf, txt_rect)
-            # draw credits
-            lines = [
-                'By the Incredibles',
-                'Ahmed Elgalay',
-                'Abdelrahman Salah',
-                'Amr Fawzy',
-                'Ahmed Zidan'
-            ]
+            if redraw:
+                self.screen.blit(self.starfield, (0, 0))
+                # draw title
+                self.screen.blit(title_surf, title_rect)
+                # draw start button
+                pygame.draw.rect(self.screen, self.colors['grid_color'], btn_rect, border_radius=10)
+                self.screen.blit(txt_surf, txt_rect)
+                # draw credits
+                for line_surf, line_rect in credits:
+                    self.screen.blit(line_surf, line_rect)
+                pygame.display.flip()
 
-            # Starting vertical position
-            start_y = self.HEIGHT // 2 + 100
-
-            for i, line in enumerate(lines):
-                line_surf = self.credits_font.render(line, True, self.colors['text_color'])
-                line_rect = line_surf.get_rect(center=(self.WIDTH//2, start_y + i * 40))  # 40 pixels spacing between lines
-                self.screen.blit(line_surf, line_rect)
-            pygame.display.flip()
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                if event.type == pygame.MOUSEBUTTONDOWN and btn_rect.collidepoint(event.pos):
-                    return True
-            clock.tick(30)
+            # the menu is static: sleep until something happens
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.MOUSEBUTTONDOWN and btn_rect.collidepoint(event.pos):
+                return True
+            redraw = event.type == pygame.VIDEOEXPOSE